@@ -0,0 +1,203 @@
+"""End-to-end benchmark of scenario_1-style runs against the local fake YouTube API server.
+
+For every channel size and concurrency level it discovers the drafts through the uploads playlist,
+updates them and adds them to a playlist, then reports wall time, API calls, quota used and peak
+memory. Results are saved as a JSON baseline, and can be compared with a previous one:
+
+    python benchmark.py --sizes 500 2000 5000 --concurrency 1 4 8 --output benchmark_baseline.json
+    python benchmark.py --compare benchmark_baseline.json
+    python benchmark.py --sizes 2000 --concurrency 1 4 8 --async   # async backend, concurrency = MAX_IN_FLIGHT
+    python benchmark.py --startup                                   # import time and first client build
+"""
+import sys
+import json
+import time
+import statistics
+import subprocess
+import logging
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+
+import youtube_mass_updater as ymu
+from fake_youtube_server import start_fake_server_process, fetch_stats, build_fake_client
+
+DEFAULT_SIZES = [500, 2000, 5000]
+DEFAULT_CONCURRENCY = [1, 4, 8]
+
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import youtube_mass_updater as ymu
+imported = time.perf_counter()
+from google.oauth2.credentials import Credentials
+ymu.build('youtube', 'v3', credentials=Credentials('token'))
+built = time.perf_counter()
+ymu.build('youtube', 'v3', credentials=Credentials('token'))
+print(json.dumps({"import": imported - start, "first_client": built - imported, "next_client": time.perf_counter() - built}))
+"""
+
+
+def benchmark_config(concurrency, journal_file, async_backend=False):
+    return {
+        "TITLE_PREFIX": "Episode ",
+        "TITLE_SUFFIX": " | Benchmark",
+        "PLAYLIST_ID": "PLbenchmark",
+        "DESCRIPTION": "Benchmark run",
+        "VIDEO_TAGS": ["benchmark"],
+        "START_DATE": datetime.datetime(2030, 1, 1),
+        "FIRST_INTERVAL": (1, 9),
+        "SECOND_INTERVAL": (13, 23),
+        "VIDEOS_PER_DAY": 2,
+        "SCHEDULE_SEED": 0,
+        "USE_BATCH": True,
+        "CONCURRENCY": concurrency,
+        "JOURNAL_FILE": journal_file,
+        "START_VIDEO_NUMBER": 1,
+        "END_VIDEO_NUMBER": 10 ** 9,
+        "MAX_VIDEOS": 10 ** 9,
+        "REQ_MAX_RESULT": ymu.MAX_PAGE_SIZE,
+        "DISCOVERY_MODE": "uploads",
+        "ASYNC_BACKEND": async_backend,
+        "MAX_IN_FLIGHT": concurrency,
+    }
+
+
+def run_once(size, concurrency, latency=0.0, error_rate=0.0, streaming=False, async_backend=False):
+    """Run discovery and updates once on a fresh fake channel of size videos. Returns the measurements.
+    Streaming runs go through stream_updates and do not measure discovery_time."""
+    process, url = start_fake_server_process(video_count=size, latency=latency, error_rate=error_rate)
+    ymu.load_quota_ledger(daily_quota=10 ** 9)
+    ymu.CATEGORY_CACHE.clear()
+    ymu.PLAYLIST_MEMBERS.clear()
+    try:
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as journal:
+            youtube = build_fake_client(url, concurrency if async_backend else None)
+            config = benchmark_config(concurrency, journal.name, async_backend)
+
+            tracemalloc.start()
+            started_at = time.time()
+            start = time.perf_counter()
+            if streaming:
+                report = ymu.stream_updates(youtube, config, lambda: build_fake_client(url))
+                drafts = len(report)
+                discovered = None
+            else:
+                draft_videos, scheduled_videos = ymu.get_all_draft_videos(
+                    youtube, 1, size + 1, ymu.MAX_PAGE_SIZE, discovery_mode="uploads", max_in_flight=concurrency if async_backend else 1
+                )
+                drafts = len(draft_videos)
+                discovered = time.perf_counter()
+                report = ymu.update_videos(youtube, draft_videos, config, lambda: build_fake_client(url))
+            end = time.perf_counter()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        stats = fetch_stats(url)
+    finally:
+        process.terminate()
+        process.join()
+
+    return {
+        "channel_size": size,
+        "concurrency": concurrency,
+        "streaming": streaming,
+        "backend": "async" if async_backend else "batch",
+        "drafts": drafts,
+        "updated": sum(1 for result in report.values() if result["update"] == "ok"),
+        "wall_time": round(end - start, 3),
+        "discovery_time": round(discovered - start, 3) if discovered else None,
+        "update_time": round(end - discovered, 3) if discovered else None,
+        "time_to_first_update": round(stats["first_update_at"] - started_at, 3) if stats["first_update_at"] else None,
+        "api_calls": stats["api_calls"],
+        "http_requests": stats["http_requests"],
+        "quota_used": stats["quota_used"],
+        "bytes_received": stats["bytes_sent"],
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, concurrency_levels=DEFAULT_CONCURRENCY, latency=0.0, error_rate=0.0, streaming=False, async_backend=False):
+    # Measure the update engine, not the production throttle or backoff delays
+    ymu.configure_request_executor(rate_limit=10 ** 6, base_delay=0.01)
+    results = []
+    for size in sizes:
+        for concurrency in concurrency_levels:
+            result = run_once(size, concurrency, latency, error_rate, streaming, async_backend)
+            logging.warning(
+                f"size={size} concurrency={concurrency} streaming={streaming} backend={result['backend']} wall={result['wall_time']}s "
+                f"first_update={result['time_to_first_update']}s "
+                f"calls={result['api_calls']} quota={result['quota_used']} peak={result['peak_memory_bytes'] // 1024}KiB"
+            )
+            results.append(result)
+    return results
+
+
+def print_table(results):
+    columns = ["channel_size", "concurrency", "streaming", "backend", "drafts", "updated", "wall_time", "time_to_first_update", "api_calls", "http_requests", "quota_used", "bytes_received", "peak_memory_bytes"]
+    print(" ".join(f"{column:>17}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result.get(column)):>17}" for column in columns))
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return the runs whose wall time regressed by more than tolerance (0.2 = 20%) over baseline."""
+    def key(entry):
+        return entry["channel_size"], entry["concurrency"], entry.get("streaming", False), entry.get("backend", "batch")
+
+    previous = {key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    for result in results:
+        reference = previous.get(key(result))
+        if reference and result["wall_time"] > reference["wall_time"] * (1 + tolerance):
+            regressions.append((result, reference))
+    return regressions
+
+
+def measure_startup(runs=5):
+    """Time the module import and the first and second client builds in fresh interpreters. Returns medians in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output))
+    return {name: round(statistics.median(sample[name] for sample in samples) * 1000, 1) for name in samples[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark youtube_mass_updater against the fake YouTube API server.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Channel sizes (number of videos)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY, help="CONCURRENCY levels")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of latency added to every HTTP request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of API calls answered with a 503")
+    parser.add_argument("--streaming", action="store_true", help="Run the streaming pipeline (STREAMING=true) instead of discovery then updates")
+    parser.add_argument("--async", dest="async_backend", action="store_true", help="Send individual calls through the async backend (ASYNC_BACKEND=true) instead of batches")
+    parser.add_argument("--startup", action="store_true", help="Only measure the import time and the first client build, in milliseconds")
+    parser.add_argument("--output", help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", help="Compare with a JSON baseline and fail on wall time regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed wall time regression for --compare")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        print(" ".join(f"{name}={value}ms" for name, value in measure_startup().items()))
+        return 0
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = run_benchmark(args.sizes, args.concurrency, args.latency, args.error_rate, args.streaming, args.async_backend)
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"latency": args.latency, "error_rate": args.error_rate, "streaming": args.streaming, "async": args.async_backend, "results": results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for result, reference in regressions:
+            print(f"Regression: size={result['channel_size']} concurrency={result['concurrency']} "
+                  f"wall time {result['wall_time']}s vs {reference['wall_time']}s")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
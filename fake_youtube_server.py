@@ -0,0 +1,396 @@
+"""Local stand-in for the subset of the YouTube Data API v3 used by youtube_mass_updater.
+
+It serves search, channels, videos list/update, playlistItems list/insert, videoCategories and the
+batch endpoint from an in-memory channel, with paging tokens, ETags, configurable latency, error
+rate, daily quota and fields= partial responses. Use it offline:
+
+    server = start_fake_server(FakeChannel(5000))
+    youtube = build_fake_client(server.url)
+    ...
+    server.shutdown()
+
+start_fake_server_process() runs it in a child process instead, so the server does not compete
+with the client for the GIL when measuring throughput.
+"""
+import json
+import time
+import multiprocessing
+import random
+import hashlib
+import datetime
+import threading
+import urllib.parse
+from email.parser import FeedParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from youtube_mass_updater import QUOTA_COSTS, PooledHttp
+
+API_PREFIX = "/youtube/v3/"
+UPLOADS_PLAYLIST_ID = "UUfake"
+CHANNEL_ID = "UCfake"
+PAGE_SIZE = 50
+STATS_PATH = "/_fake/stats"  # Not part of the API: call counters of the fake channel
+CATEGORIES = {"1": "Film & Animation", "10": "Music", "20": "Gaming", "22": "People & Blogs", "24": "Entertainment"}
+
+# (HTTP method, resource) -> quota method name
+ROUTES = {
+    ("GET", "search"): "search.list",
+    ("GET", "channels"): "channels.list",
+    ("GET", "videos"): "videos.list",
+    ("PUT", "videos"): "videos.update",
+    ("GET", "playlistItems"): "playlistItems.list",
+    ("POST", "playlistItems"): "playlistItems.insert",
+    ("GET", "videoCategories"): "videoCategories.list",
+}
+
+
+class FakeChannel:
+    """In-memory channel: videos titled "1" to "video_count", some drafts, some scheduled, the rest public."""
+
+    def __init__(self, video_count, draft_ratio=0.8, scheduled_ratio=0.1, latency=0.0, error_rate=0.0, daily_quota=None, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.daily_quota = daily_quota
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.http_requests = 0
+        self.quota_used = 0
+        self.bytes_sent = 0
+        self.first_update_at = None  # time.time() of the first videos.update, for time-to-first-update
+        self.videos = {}
+        self.uploads = []  # Newest first, like the real uploads playlist
+        self.playlists = {}
+
+        start = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+        for number in range(1, video_count + 1):
+            video_id = f"vid{number:06d}"
+            status = {"privacyStatus": "private"}
+            roll = self.rng.random()
+            if roll >= draft_ratio + scheduled_ratio:
+                status["privacyStatus"] = "public"
+            elif roll >= draft_ratio:
+                status["publishAt"] = (start + datetime.timedelta(hours=number)).strftime('%Y-%m-%dT%H:%M:%SZ')
+            self.videos[video_id] = {
+                "kind": "youtube#video",
+                "id": video_id,
+                "snippet": {"title": str(number), "description": "", "tags": [], "categoryId": "22", "channelId": CHANNEL_ID},
+                "status": status
+            }
+            self.uploads.insert(0, video_id)
+
+    def count_call(self, method):
+        """Charge a call to the quota. Returns an (status, error reason) to answer with, or None."""
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            cost = QUOTA_COSTS[method]
+            if self.daily_quota is not None and self.quota_used + cost > self.daily_quota:
+                return 403, "quotaExceeded"
+            self.quota_used += cost
+            if self.error_rate and self.rng.random() < self.error_rate:
+                return 503, "backendError"
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "api_calls": sum(self.calls.values()),
+                "http_requests": self.http_requests,
+                "calls": dict(self.calls),
+                "quota_used": self.quota_used,
+                "bytes_sent": self.bytes_sent,
+                "first_update_at": self.first_update_at
+            }
+
+    # ---------------- Resources ----------------
+
+    def page(self, ids, query, make_item):
+        """Answer one page of ids, building only the items of that page."""
+        max_results = min(int(query.get("maxResults", 5)), PAGE_SIZE)
+        offset = int(query.get("pageToken") or 0)
+        items = [make_item(position, video_id) for position, video_id in enumerate(ids[offset:offset + max_results], offset)]
+        response = {"pageInfo": {"totalResults": len(ids), "resultsPerPage": max_results}, "items": items}
+        if offset + max_results < len(ids):
+            response["nextPageToken"] = str(offset + max_results)
+        return response
+
+    def search_list(self, query, body):
+        return 200, self.page(self.uploads, query, lambda position, video_id: {
+            "kind": "youtube#searchResult",
+            "id": {"kind": "youtube#video", "videoId": video_id},
+            "snippet": dict(self.videos[video_id]["snippet"])
+        })
+
+    def channels_list(self, query, body):
+        return 200, {"items": [{"id": CHANNEL_ID, "contentDetails": {"relatedPlaylists": {"uploads": UPLOADS_PLAYLIST_ID}}}]}
+
+    def videos_list(self, query, body):
+        ids = [video_id for video_id in query.get("id", "").split(",") if video_id]
+        if len(ids) > PAGE_SIZE:
+            return 400, "tooManyIds"
+        return 200, {"items": [self.videos[video_id] for video_id in ids if video_id in self.videos]}
+
+    def videos_update(self, query, body):
+        video = self.videos.get(body.get("id"))
+        if video is None:
+            return 404, "videoNotFound"
+        parts = query.get("part", "").split(",")
+        if "snippet" in parts:
+            if len(body["snippet"].get("title", "")) > 100:
+                return 400, "invalidTitle"
+            video["snippet"].update(body["snippet"])
+        if "status" in parts:
+            video["status"] = dict(body["status"])
+            if "publishAt" in video["status"]:
+                # Like the API, answer with UTC times; naive times are taken as UTC
+                publish_at = datetime.datetime.fromisoformat(video["status"]["publishAt"].replace("Z", "+00:00"))
+                publish_at = publish_at.replace(tzinfo=publish_at.tzinfo or datetime.timezone.utc).astimezone(datetime.timezone.utc)
+                video["status"]["publishAt"] = publish_at.strftime("%Y-%m-%dT%H:%M:%SZ")
+        if self.first_update_at is None:
+            self.first_update_at = time.time()
+        return 200, video
+
+    def playlist_items_list(self, query, body):
+        playlist_id = query.get("playlistId")
+        ids = self.uploads if playlist_id == UPLOADS_PLAYLIST_ID else self.playlists.get(playlist_id, [])
+        parts = query.get("part", "snippet").split(",")
+
+        def make_item(position, video_id):
+            item = {"id": f"PLI{playlist_id}{video_id}"}
+            if "snippet" in parts:
+                item["snippet"] = {
+                    "title": self.videos[video_id]["snippet"]["title"],
+                    "position": position,
+                    "resourceId": {"kind": "youtube#video", "videoId": video_id}
+                }
+            if "contentDetails" in parts:
+                item["contentDetails"] = {"videoId": video_id}
+            return item
+
+        return 200, self.page(ids, query, make_item)
+
+    def playlist_items_insert(self, query, body):
+        snippet = body["snippet"]
+        video_id = snippet["resourceId"]["videoId"]
+        if video_id not in self.videos:
+            return 404, "videoNotFound"
+        members = self.playlists.setdefault(snippet["playlistId"], [])
+        position = snippet.get("position", len(members))
+        members.insert(position, video_id)
+        return 200, {"id": f"PLI{snippet['playlistId']}{video_id}", "snippet": dict(snippet, position=position)}
+
+    def video_categories_list(self, query, body):
+        return 200, {"items": [{"id": category_id, "snippet": {"title": title, "assignable": True}} for category_id, title in CATEGORIES.items()]}
+
+    def handle(self, http_method, path, query, headers, body):
+        """Answer one API call with (status, JSON payload or None)."""
+        resource = path[len(API_PREFIX):] if path.startswith(API_PREFIX) else None
+        method = ROUTES.get((http_method, resource))
+        if method is None:
+            return 404, error_payload(404, "notFound")
+        failure = self.count_call(method)
+        if failure:
+            return failure[0], error_payload(*failure)
+
+        handler = {
+            "search.list": self.search_list,
+            "channels.list": self.channels_list,
+            "videos.list": self.videos_list,
+            "videos.update": self.videos_update,
+            "playlistItems.list": self.playlist_items_list,
+            "playlistItems.insert": self.playlist_items_insert,
+            "videoCategories.list": self.video_categories_list,
+        }[method]
+        with self.lock:
+            status, payload = handler(query, json.loads(body) if body else {})
+            if status != 200:
+                return status, error_payload(status, payload)
+            payload = json.loads(json.dumps(payload))  # Detach the response from the channel state
+        payload["etag"] = hashlib.md5(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        if http_method == "GET" and headers.get("if-none-match") == payload["etag"]:
+            return 304, None
+        if query.get("fields"):
+            payload = select_fields(payload, parse_fields(query["fields"]))
+        return status, payload
+
+
+def error_payload(status, reason):
+    return {"error": {"code": status, "message": reason, "errors": [{"reason": reason, "domain": "youtube"}]}}
+
+
+def parse_fields(expression):
+    """Parse a fields= expression such as "items(id,snippet(title,resourceId/videoId))" into a tree:
+    a dict of field name -> subtree, True selecting the whole value."""
+    tree = {}
+
+    def add(node, path, leaf):
+        *parents, name = path.split("/")
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        if leaf:
+            node.setdefault(name, True)
+            return None
+        return node.setdefault(name, {})
+
+    def parse(position, node):
+        name = ""
+        while position < len(expression):
+            char = expression[position]
+            position += 1
+            if char == "(":
+                position = parse(position, add(node, name, False))
+                name = ""
+            elif char in ",)":
+                if name:
+                    add(node, name, True)
+                name = ""
+                if char == ")":
+                    return position
+            elif not char.isspace():
+                name += char
+        if name:
+            add(node, name, True)
+        return position
+
+    parse(0, tree)
+    return tree
+
+
+def select_fields(value, tree):
+    """Keep only the parts of value selected by a parse_fields() tree."""
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {name: select_fields(value[name], subtree) for name, subtree in tree.items() if name in value}
+    return value
+
+
+def parse_http_message(raw):
+    """Split an application/http request into (method, path, query, headers, body)."""
+    head, _, body = raw.replace("\r\n", "\n").partition("\n\n")
+    request_line, *header_lines = head.split("\n")
+    http_method, target, _ = request_line.split(" ", 2)
+    headers = {}
+    for line in header_lines:
+        if ":" in line:
+            key, value = line.split(":", 1)
+            headers[key.strip().lower()] = value.strip()
+    parsed = urllib.parse.urlparse(target)
+    query = dict(urllib.parse.parse_qsl(parsed.query))
+    return http_method, parsed.path, query, headers, body.strip() or None
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately: without this, Nagle's algorithm and delayed ACKs add
+    # ~40ms to every response on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else None
+
+    def send(self, status, content, content_type="application/json", etag=None):
+        data = content.encode("utf-8")
+        with self.server.channel.lock:
+            self.server.channel.bytes_sent += len(data)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def dispatch(self):
+        channel = self.server.channel
+        with channel.lock:
+            channel.http_requests += 1
+        if channel.latency:
+            threading.Event().wait(channel.latency)
+
+        parsed = urllib.parse.urlparse(self.path)
+        body = self.read_body()
+        if parsed.path == STATS_PATH:
+            return self.send(200, json.dumps(channel.stats()))
+        if parsed.path == "/batch":
+            return self.dispatch_batch(body)
+
+        headers = {key.lower(): value for key, value in self.headers.items()}
+        status, payload = channel.handle(self.command, parsed.path, dict(urllib.parse.parse_qsl(parsed.query)), headers, body)
+        if payload is None:
+            self.send(status, "")
+        else:
+            self.send(status, json.dumps(payload), etag=payload.get("etag"))
+
+    def dispatch_batch(self, body):
+        parser = FeedParser()
+        parser.feed(f"Content-Type: {self.headers['Content-Type']}\r\n\r\n{body}")
+        message = parser.close()
+        boundary = "fake_batch_boundary"
+        parts = []
+        for part in message.get_payload():
+            http_method, path, query, headers, sub_body = parse_http_message(part.get_payload())
+            status, payload = self.server.channel.handle(http_method, path, query, headers, sub_body)
+            reason = "OK" if status == 200 else "Error"
+            content = json.dumps(payload) if payload is not None else ""
+            content_id = part["Content-ID"]
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id[1:-1]}>\r\n\r\n"
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n\r\n{content}\r\n"
+            )
+        self.send(200, "".join(parts) + f"--{boundary}--\r\n", f'multipart/mixed; boundary="{boundary}"')
+
+    do_GET = dispatch
+    do_PUT = dispatch
+    do_POST = dispatch
+
+
+def start_fake_server(channel, host="127.0.0.1", port=0):
+    """Serve channel on a background thread. The server has .url and .channel; call .shutdown() to stop it."""
+    server = ThreadingHTTPServer((host, port), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.channel = channel
+    server.url = f"http://{host}:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def serve_in_child(channel_options, url_queue):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeYouTubeHandler)
+    server.daemon_threads = True
+    server.channel = FakeChannel(**channel_options)
+    url_queue.put(f"http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
+
+
+def start_fake_server_process(**channel_options):
+    """Serve a FakeChannel(**channel_options) from a child process. Returns (process, url); terminate the process to stop it."""
+    url_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_in_child, args=(channel_options, url_queue), daemon=True)
+    process.start()
+    return process, url_queue.get(timeout=30)
+
+
+def fetch_stats(url):
+    """Return the call counters of the fake server at url."""
+    response, content = httplib2.Http().request(url + STATS_PATH)
+    return json.loads(content)
+
+
+def build_fake_client(url, pool_size=None):
+    """Build a youtube v3 client that talks to the fake server at url, on a PooledHttp if pool_size is given."""
+    document = json.loads(get_static_doc("youtube", "v3"))
+    document["rootUrl"] = url + "/"
+    document["baseUrl"] = url + "/"
+    return build_from_document(document, http=PooledHttp(pool_size=pool_size) if pool_size else httplib2.Http())
@@ -0,0 +1,193 @@
+"""Run scenario 1 on a fleet of channels in parallel, one process per channel.
+
+The manifest is a JSON file listing the channels:
+
+    {
+      "client_secrets": "credentials.json",
+      "max_workers": 4,
+      "channels": [
+        {"name": "main", "quota_budget": 6000, "overrides": {"TITLE_PREFIX": "Episode "}},
+        {"name": "clips", "env_file": "clips.env", "token_file": "clips_token.json", "quota_budget": 4000}
+      ]
+    }
+
+Each channel runs in its own directory (channels/<name> by default), where its token, quota ledger,
+run journal, inventory and run.log live. Relative paths in the manifest are relative to the manifest's
+own directory, except token_file and env_file, which are relative to the channel directory. quota_budget
+becomes the channel's DAILY_QUOTA: channels sharing one Google Cloud project share its daily quota, so
+keep the sum of their budgets under it.
+
+    python multi_channel.py channels.json --authorize main      # OAuth flow for one channel, once
+    python multi_channel.py channels.json --report fleet_report.json
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import youtube_mass_updater as ymu
+
+REPORT_COLUMNS = ["channel", "status", "drafts", "updated", "inserted", "failed", "quota_used", "wall_time"]
+
+
+def load_manifest(manifest_file):
+    """Read a manifest and resolve every channel's paths. Returns (channels, max_workers)."""
+    with open(manifest_file, 'r') as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(manifest_file))
+    client_secrets = os.path.join(base, manifest.get("client_secrets", "credentials.json"))
+
+    channels = []
+    names = set()
+    for entry in manifest["channels"]:
+        name = entry["name"]
+        if name in names:
+            raise ValueError(f"Channel '{name}' appears twice in {manifest_file}.")
+        names.add(name)
+        directory = os.path.join(base, entry.get("directory", os.path.join("channels", name)))
+        overrides = dict(entry.get("overrides", {}))
+        if "quota_budget" in entry:
+            overrides["DAILY_QUOTA"] = entry["quota_budget"]
+        channels.append({
+            "name": name,
+            "directory": directory,
+            "token_file": os.path.join(directory, entry.get("token_file", "token.json")),
+            "env_file": os.path.join(directory, entry["env_file"]) if entry.get("env_file") else None,
+            "client_secrets_file": os.path.join(base, entry["client_secrets"]) if entry.get("client_secrets") else client_secrets,
+            "overrides": overrides,
+        })
+    return channels, manifest.get("max_workers", len(channels))
+
+
+def configure_channel_logging(log_file, debug=False):
+    """Send this process's logs to log_file only, so channels running side by side never mix."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+
+
+def summarize_report(report):
+    if report is None:
+        return {"drafts": None, "updated": None, "inserted": None, "failed": None}
+    return {
+        "drafts": len(report),
+        "updated": sum(1 for result in report.values() if result["update"] == "ok"),
+        "inserted": sum(1 for result in report.values() if result["playlist_insert"] == "ok"),
+        "failed": sum(1 for result in report.values() if "failed" in (result["update"], result["playlist_insert"])),
+    }
+
+
+def run_channel(channel, scenario_options=None, debug=False):
+    """Run scenario 1 for one channel inside its directory. Returns the channel's line of the fleet report."""
+    os.makedirs(channel["directory"], exist_ok=True)
+    log_file = os.path.join(channel["directory"], "run.log")
+    configure_channel_logging(log_file, debug)
+    result = {"channel": channel["name"], "status": "ok", "error": None, "log_file": log_file}
+    previous_directory = os.getcwd()
+    start = time.perf_counter()
+    try:
+        # Ledger, journal, inventory and caches default to relative paths: keep them per channel
+        os.chdir(channel["directory"])
+        report = ymu.scenario_1(
+            env_file=channel["env_file"],
+            overrides=channel["overrides"],
+            token_file=channel["token_file"],
+            client_secrets_file=channel["client_secrets_file"],
+            interactive=False,
+            **(scenario_options or {})
+        )
+        result.update(summarize_report(report))
+    except (Exception, SystemExit) as e:
+        # load_configurations exits on an invalid configuration; report it like any other failure
+        logging.exception(f"Channel {channel['name']} failed.")
+        result.update(summarize_report(None))
+        result.update({"status": "failed", "error": repr(e)})
+    finally:
+        os.chdir(previous_directory)
+    result["quota_used"] = sum(entry["quota"] for entry in ymu.METRICS.values())
+    result["wall_time"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_fleet(channels, max_workers, scenario_options=None, debug=False, worker=run_channel):
+    """Run worker(channel, scenario_options, debug) for every channel, each in a fresh process so no module state leaks.
+    Returns the results in manifest order."""
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(channels))), max_tasks_per_child=1) as executor:
+        futures = [executor.submit(worker, channel, scenario_options, debug) for channel in channels]
+        results = []
+        for channel, future in zip(channels, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker process itself died
+                results.append({"channel": channel["name"], "status": "failed", "error": repr(e), **summarize_report(None)})
+            logging.info(f"Channel {channel['name']}: {results[-1]['status']}.")
+    return results
+
+
+def format_report(results):
+    lines = [" ".join(f"{column:>12}" for column in REPORT_COLUMNS)]
+    for result in results:
+        lines.append(" ".join(f"{str(result.get(column)):>12}" for column in REPORT_COLUMNS))
+    ok = sum(1 for result in results if result["status"] == "ok")
+    totals = ["total", f"{ok}/{len(results)} ok"]
+    totals += [sum(result.get(column) or 0 for result in results) for column in REPORT_COLUMNS[2:-1]]
+    # Channels run side by side: the fleet takes as long as its slowest channel
+    totals.append(max((result.get("wall_time") or 0 for result in results), default=0))
+    lines.append(" ".join(f"{str(value):>12}" for value in totals))
+    return "\n".join(lines)
+
+
+def authorize_channel(channel):
+    """Run the interactive OAuth flow for one channel and save its token."""
+    os.makedirs(channel["directory"], exist_ok=True)
+    ymu.load_credentials(channel["token_file"], channel["client_secrets_file"], interactive=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run youtube_mass_updater scenario 1 on several channels in parallel.")
+    parser.add_argument("manifest", help="JSON manifest of the channels")
+    parser.add_argument("--channels", nargs="+", help="Only run these channels")
+    parser.add_argument("--max-workers", type=int, help="Channels run at the same time (default: manifest, or all)")
+    parser.add_argument("--authorize", metavar="CHANNEL", help="Run the OAuth flow for one channel and exit")
+    parser.add_argument("--resume", action="store_true", help="Finish each channel's journaled run")
+    parser.add_argument("--plan", dest="plan_file", nargs="?", const="plan.json", help="Write each channel's plan in its directory")
+    parser.add_argument("--report", help="Save the combined report as JSON")
+    parser.add_argument("--debug", action="store_true", help="Log at DEBUG level in the channel logs")
+    args = parser.parse_args(argv)
+
+    ymu.configure_logging()
+    channels, max_workers = load_manifest(args.manifest)
+    if args.authorize:
+        matching = [channel for channel in channels if channel["name"] == args.authorize]
+        if not matching:
+            logging.error(f"Channel '{args.authorize}' not found in {args.manifest}.")
+            return 1
+        authorize_channel(matching[0])
+        return 0
+    if args.channels:
+        channels = [channel for channel in channels if channel["name"] in args.channels]
+
+    results = run_fleet(channels, args.max_workers or max_workers, {"resume": args.resume, "plan_file": args.plan_file}, args.debug)
+    print(format_report(results))
+    for result in results:
+        if result["error"]:
+            print(f"{result['channel']}: {result['error']} (see {result.get('log_file')})")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({"created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(), "channels": results}, f, indent=2)
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
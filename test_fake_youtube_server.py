@@ -0,0 +1,211 @@
+import os
+import unittest
+import tempfile
+import datetime
+import logging
+import youtube_mass_updater as ymu
+import benchmark
+from googleapiclient.errors import HttpError
+from fake_youtube_server import FakeChannel, start_fake_server, build_fake_client
+
+
+def fake_run_config(**overrides):
+    """The benchmark's run configuration, on the test playlist, with the keys a test needs changed."""
+    config = benchmark.benchmark_config(concurrency=1, journal_file="")
+    config.update(TITLE_SUFFIX="", PLAYLIST_ID="PLtest", **overrides)
+    return config
+
+
+class TestFakeYouTubeServer(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        ymu.configure_request_executor(rate_limit=100000, base_delay=0)
+        ymu.load_quota_ledger(daily_quota=10 ** 9)
+        ymu.CATEGORY_CACHE.clear()
+        ymu.PLAYLIST_MEMBERS.clear()
+        ymu.reset_metrics()
+        self.server = start_fake_server(FakeChannel(120))
+        self.youtube = build_fake_client(self.server.url)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        logging.disable(logging.NOTSET)
+
+    def test_discovery_and_batched_updates_end_to_end(self):
+        channel = self.server.channel
+        draft_videos, scheduled_videos = ymu.get_all_draft_videos(self.youtube, 1, 121, 50, discovery_mode="uploads")
+        expected_drafts = [video for video in channel.videos.values() if 'publishAt' not in video['status'] and video['status']['privacyStatus'] == 'private']
+        self.assertEqual(len(draft_videos), len(expected_drafts))
+        self.assertEqual([int(video.title) for video in draft_videos], sorted(int(video['snippet']['title']) for video in expected_drafts))
+
+        config = fake_run_config(CONCURRENCY=2)
+        report = ymu.update_videos(self.youtube, draft_videos, config, lambda: build_fake_client(self.server.url))
+
+        self.assertTrue(all(result == {"update": "ok", "playlist_insert": "ok", "error": None} for result in report.values()))
+        first = channel.videos[draft_videos[0].id]
+        self.assertEqual(first['snippet']['title'], "Episode " + draft_videos[0].title)
+        self.assertIn('publishAt', first['status'])
+        # Each video is inserted at the head of the playlist after the previous one, across workers
+        self.assertEqual(channel.playlists["PLtest"], [video.id for video in reversed(draft_videos)])
+        # Uploads walk: channels.list + 3 pages, then 50-ID chunks, categories, the target playlist's
+        # membership (1 page), then one batch per 50 updates and one call per playlist insert
+        self.assertEqual(channel.calls["playlistItems.list"], 4)
+        self.assertEqual(channel.calls["videos.update"], len(draft_videos))
+        self.assertEqual(ymu.METRICS["playlistItems.list"]["calls"], 4)
+        self.assertEqual(ymu.METRICS["videos.update"]["calls"], len(draft_videos))
+        self.assertGreater(ymu.METRICS["videos.update"]["bytes"], 0)
+
+    def test_streaming_updates_schedule_drafts_in_number_order(self):
+        channel = self.server.channel
+        config = fake_run_config(START_DATE=datetime.datetime(2023, 1, 1))
+        report = ymu.stream_updates(self.youtube, config, lambda: build_fake_client(self.server.url))
+
+        drafts = sorted(
+            (int(video['snippet']['title'][len("Episode "):]), video['status']['publishAt'])
+            for video in channel.videos.values() if video['snippet']['title'].startswith("Episode ")
+        )
+        self.assertEqual(len(drafts), len(report))
+        self.assertTrue(all(result["update"] == "ok" for result in report.values()))
+        self.assertEqual([publish_at for _, publish_at in drafts], sorted(publish_at for _, publish_at in drafts))
+        self.assertEqual(channel.calls["playlistItems.list"], 4)
+        # Scheduled after the latest scheduled video, like a non-streaming run, without sharing a slot or overfilling a day
+        scheduled = [video['status']['publishAt'] for video in channel.videos.values()
+                     if 'publishAt' in video['status'] and not video['snippet']['title'].startswith("Episode ")]
+        self.assertGreater(min(publish_at for _, publish_at in drafts), max(scheduled)[:10])
+        publish_times = [publish_at for _, publish_at in drafts] + scheduled
+        self.assertEqual(len(set(publish_times)), len(publish_times))
+        days = [publish_at[:10] for _, publish_at in drafts]
+        self.assertLessEqual(max(days.count(day) for day in days), config["VIDEOS_PER_DAY"])
+
+    def test_streaming_costs_playlist_members_like_a_full_run(self):
+        channel = self.server.channel
+        draft_videos, _ = ymu.get_all_draft_videos(self.youtube, 1, 121, 50, discovery_mode="uploads")
+        channel.playlists["PLtest"] = [video.id for video in draft_videos]
+        # Enough for discovery and one update per draft, not for an insert too
+        ymu.load_quota_ledger(daily_quota=len(draft_videos) * ymu.QUOTA_COSTS["videos.update"] + 100)
+        report = ymu.stream_updates(self.youtube, fake_run_config(), lambda: build_fake_client(self.server.url))
+
+        self.assertEqual(len(report), len(draft_videos))
+        self.assertTrue(all(result["update"] == "ok" and result["playlist_insert"] == "done" for result in report.values()))
+
+    def test_async_backend_sends_individual_calls_on_a_pooled_client(self):
+        channel = self.server.channel
+        youtube = build_fake_client(self.server.url, pool_size=4)
+        draft_videos, _ = ymu.get_all_draft_videos(youtube, 1, 121, 50, discovery_mode="uploads", max_in_flight=4)
+        config = fake_run_config(ASYNC_BACKEND=True, MAX_IN_FLIGHT=4, PLAYLIST_POSITION="end")
+        report = ymu.update_videos(youtube, draft_videos, config)
+
+        self.assertTrue(all(result == {"update": "ok", "playlist_insert": "ok", "error": None} for result in report.values()))
+        self.assertEqual(channel.playlists["PLtest"], [video.id for video in draft_videos])
+        self.assertEqual(channel.calls["videos.update"], len(draft_videos))
+        self.assertEqual(channel.stats()["http_requests"], channel.stats()["api_calls"])  # No batch
+
+    def test_playlist_members_are_not_inserted_again(self):
+        channel = self.server.channel
+        channel.playlists["PLtest"] = ["vid000003"]
+        draft_videos, _ = ymu.get_all_draft_videos(self.youtube, 1, 121, 50, discovery_mode="uploads")
+        config = fake_run_config(PLAYLIST_POSITION="end")
+        if "vid000003" not in [video.id for video in draft_videos]:
+            draft_videos.append(ymu.video_record(channel.videos["vid000003"]))
+
+        ymu.update_videos(self.youtube, draft_videos[:10], config)
+        ymu.update_videos(self.youtube, draft_videos[:20], config)  # Re-run: only the 10 new videos are inserted
+
+        members = channel.playlists["PLtest"]
+        self.assertEqual(len(members), len(set(members)))
+        self.assertEqual(channel.calls["playlistItems.insert"], len({video.id for video in draft_videos[:20]} - {"vid000003"}))
+        # Appended after the existing member, in schedule (video number) order
+        self.assertEqual(members[0], "vid000003")
+        self.assertEqual(members[1:], sorted(members[1:]))
+        # The membership was listed once, then kept up to date in memory
+        self.assertEqual(ymu.METRICS["playlistItems.list"]["calls"], 3 + 1)
+
+    def test_applying_a_plan_again_skips_the_videos_already_updated(self):
+        channel = self.server.channel
+        draft_videos, _ = ymu.get_all_draft_videos(self.youtube, 1, 121, 50, discovery_mode="uploads")
+        config = fake_run_config()
+        with tempfile.TemporaryDirectory() as tmp:
+            plan_file = os.path.join(tmp, "plan.json")
+            ymu.write_plan(ymu.build_plan(self.youtube, draft_videos, config), plan_file)
+            ymu.apply_plan(self.youtube, plan_file, dict(config))
+            updates = channel.calls["videos.update"]
+            first_video = channel.videos[draft_videos[0].id]
+            first_video["status"].pop("publishAt")  # Unscheduled by hand since
+            report = ymu.apply_plan(self.youtube, plan_file, dict(config))
+
+        self.assertEqual(updates, len(draft_videos))
+        self.assertEqual(channel.calls["videos.update"], updates + 1)
+        self.assertIn("publishAt", first_video["status"])
+        self.assertEqual(sum(result["update"] == "unchanged" for result in report.values()), len(draft_videos) - 1)
+
+    def test_partial_responses_carry_only_the_requested_fields(self):
+        response = self.youtube.videos().list(part="snippet,status", id="vid000001", fields=ymu.VIDEO_FIELDS).execute()
+
+        self.assertEqual(set(response), {"etag", "items"})
+        self.assertEqual(set(response["items"][0]["snippet"]), {"title", "description", "tags", "categoryId"})
+        self.assertEqual(ymu.video_record(response["items"][0]).number, 1)
+
+    def test_unchanged_resources_answer_304(self):
+        request = self.youtube.videos().list(part="snippet,status", id="vid000001")
+        etag = request.execute()['etag']
+
+        request = self.youtube.videos().list(part="snippet,status", id="vid000001")
+        self.assertIsNone(ymu.execute_conditional_request(request, "videos.list", etag))
+
+    def test_quota_exhaustion_answers_403(self):
+        self.server.channel.daily_quota = 60
+        ymu.execute_request(self.youtube.videos().update(part="status", body={"id": "vid000001", "status": {"privacyStatus": "private"}}), "videos.update")
+
+        with self.assertRaises(HttpError) as raised:
+            ymu.execute_request(self.youtube.videos().update(part="status", body={"id": "vid000001", "status": {"privacyStatus": "private"}}), "videos.update")
+        self.assertTrue(ymu.is_quota_exceeded(raised.exception))
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run_benchmark_reports_every_configuration(self):
+        logging.disable(logging.CRITICAL)
+        try:
+            results = benchmark.run_benchmark(sizes=[60], concurrency_levels=[1, 2])
+        finally:
+            logging.disable(logging.NOTSET)
+
+        self.assertEqual([(result["channel_size"], result["concurrency"]) for result in results], [(60, 1), (60, 2)])
+        for result in results:
+            self.assertEqual(result["updated"], result["drafts"])
+            self.assertGreater(result["quota_used"], 0)
+            self.assertGreater(result["peak_memory_bytes"], 0)
+
+    def test_streaming_peak_memory_grows_slower_with_the_channel(self):
+        logging.disable(logging.CRITICAL)
+        ymu.configure_request_executor(rate_limit=100000, base_delay=0)
+        try:
+            peaks = {
+                (size, streaming): benchmark.run_once(size, 1, streaming=streaming)["peak_memory_bytes"]
+                for size in (50, 600) for streaming in (False, True)
+            }
+        finally:
+            logging.disable(logging.NOTSET)
+
+        # Streaming pays for its background client up front, then keeps only IDs and the report
+        streaming_growth = peaks[(600, True)] - peaks[(50, True)]
+        full_load_growth = peaks[(600, False)] - peaks[(50, False)]
+        self.assertLess(streaming_growth, full_load_growth / 2)
+
+    def test_measure_startup_times_import_and_client_builds(self):
+        startup = benchmark.measure_startup(runs=1)
+
+        self.assertEqual(set(startup), {"import", "first_client", "next_client"})
+        self.assertTrue(all(value > 0 for value in startup.values()))
+
+    def test_compare_with_baseline_flags_slower_runs(self):
+        baseline = {"results": [{"channel_size": 60, "concurrency": 1, "wall_time": 1.0}]}
+        results = [{"channel_size": 60, "concurrency": 1, "wall_time": 1.5}]
+        self.assertEqual(len(benchmark.compare_with_baseline(results, baseline, 0.2)), 1)
+        self.assertEqual(benchmark.compare_with_baseline(results, baseline, 0.6), [])
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
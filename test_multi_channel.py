@@ -0,0 +1,111 @@
+import os
+import json
+import logging
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import youtube_mass_updater as ymu
+import multi_channel
+
+
+def fake_worker(channel, scenario_options, debug):
+    """Stand-in for run_channel, run in the pool's worker processes."""
+    if channel["name"] == "broken":
+        raise RuntimeError("worker crashed")
+    return {"channel": channel["name"], "status": "ok", "error": None, "pid": os.getpid(), "quota": channel["overrides"].get("DAILY_QUOTA")}
+
+
+class TestMultiChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest_file = os.path.join(self.tmp.name, 'channels.json')
+        with open(self.manifest_file, 'w') as f:
+            json.dump({
+                "client_secrets": "shared_credentials.json",
+                "max_workers": 2,
+                "channels": [
+                    {"name": "main", "quota_budget": 6000, "overrides": {"TITLE_PREFIX": "Main "}},
+                    {"name": "clips", "directory": "elsewhere", "env_file": "clips.env", "token_file": "clips.pickle"},
+                ]
+            }, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load_manifest_resolves_paths_and_budgets(self):
+        channels, max_workers = multi_channel.load_manifest(self.manifest_file)
+
+        self.assertEqual(max_workers, 2)
+        main, clips = channels
+        self.assertEqual(main["directory"], os.path.join(self.tmp.name, "channels", "main"))
+        self.assertEqual(main["token_file"], os.path.join(self.tmp.name, "channels", "main", "token.json"))
+        self.assertEqual(main["overrides"], {"TITLE_PREFIX": "Main ", "DAILY_QUOTA": 6000})
+        self.assertIsNone(main["env_file"])
+        self.assertEqual(clips["env_file"], os.path.join(self.tmp.name, "elsewhere", "clips.env"))
+        self.assertEqual(clips["token_file"], os.path.join(self.tmp.name, "elsewhere", "clips.pickle"))
+        self.assertEqual(clips["client_secrets_file"], os.path.join(self.tmp.name, "shared_credentials.json"))
+
+    def test_channel_configuration_does_not_touch_the_environment(self):
+        env_file = os.path.join(self.tmp.name, 'clips.env')
+        with open(env_file, 'w') as f:
+            f.write("TITLE_PREFIX=Clip \nTITLE_SUFFIX= | Clips\nPLAYLIST_ID=PLclips\nDESCRIPTION=Clips\nVIDEO_TAGS=a,b\nDAILY_QUOTA=3000\n")
+
+        config = ymu.load_configurations(env_file, {"DAILY_QUOTA": 4000})
+
+        self.assertEqual(config["PLAYLIST_ID"], "PLclips")
+        self.assertEqual(config["DAILY_QUOTA"], 4000)
+        self.assertNotEqual(os.environ.get("PLAYLIST_ID"), "PLclips")
+
+    def test_unattended_runs_never_start_the_oauth_flow(self):
+        with patch('google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file') as flow:
+            with self.assertRaises(RuntimeError):
+                ymu.load_credentials(os.path.join(self.tmp.name, 'missing.pickle'), interactive=False)
+        flow.assert_not_called()
+
+    def test_run_channel_works_in_the_channel_directory(self):
+        channels, _ = multi_channel.load_manifest(self.manifest_file)
+        report = {"a": {"update": "ok", "playlist_insert": "ok", "error": None},
+                  "b": {"update": "failed", "playlist_insert": "skipped", "error": "boom"}}
+        directories = []
+
+        def scenario_1(**options):
+            directories.append(os.getcwd())
+            self.assertFalse(options["interactive"])
+            return report
+
+        previous_directory = os.getcwd()
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        try:
+            with patch('youtube_mass_updater.scenario_1', side_effect=scenario_1):
+                result = multi_channel.run_channel(channels[0])
+            with patch('youtube_mass_updater.scenario_1', side_effect=SystemExit(1)):
+                failed = multi_channel.run_channel(channels[0])
+        finally:
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+                handler.close()
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+        self.assertEqual(os.getcwd(), previous_directory)
+        self.assertEqual(directories, [os.path.realpath(channels[0]["directory"])])
+        self.assertEqual((result["status"], result["drafts"], result["updated"], result["failed"]), ("ok", 2, 1, 1))
+        self.assertEqual(failed["status"], "failed")
+        self.assertTrue(os.path.exists(result["log_file"]))
+
+    def test_run_fleet_uses_one_process_per_channel(self):
+        channels = [{"name": name, "overrides": {"DAILY_QUOTA": quota}} for name, quota in [("a", 100), ("broken", 0), ("c", 300)]]
+
+        results = multi_channel.run_fleet(channels, 2, worker=fake_worker)
+
+        self.assertEqual([result["channel"] for result in results], ["a", "broken", "c"])
+        self.assertEqual([result["status"] for result in results], ["ok", "failed", "ok"])
+        self.assertNotEqual(results[0]["pid"], results[2]["pid"])
+        self.assertIn("2/3 ok", multi_channel.format_report(results))
+
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -1,3 +1,9 @@
+import os
+import sys
+import json
+import datetime
+import tempfile
+import subprocess
 import unittest
 from unittest.mock import patch, mock_open, MagicMock
 import youtube_mass_updater as ymu
@@ -5,18 +11,18 @@ import youtube_mass_updater as ymu
 class TestOAuth(unittest.TestCase):
 
     @patch('os.path.exists')
-    @patch('builtins.open', new_callable=mock_open, read_data="mocked_data")
-    @patch('pickle.load')
+    @patch('google.oauth2.credentials.Credentials.from_authorized_user_file')
     @patch('google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file')
     @patch('youtube_mass_updater.build')
-    def test_authenticate_with_existing_token(self, mock_build, mock_flow, mock_pickle_load, mock_open, mock_exists):
-        # Simuler le fait que token.pickle existe
+    def test_authenticate_with_existing_token(self, mock_build, mock_flow, mock_from_file, mock_exists):
+        # Simuler le fait que token.json existe
         mock_exists.return_value = True
 
-        # Simuler le chargement des données depuis token.pickle
+        # Simuler le chargement des données depuis token.json
         mock_credentials = MagicMock()
         mock_credentials.valid = True
-        mock_pickle_load.return_value = mock_credentials
+        mock_credentials.expiry = None
+        mock_from_file.return_value = mock_credentials
 
         # Simuler la réponse de la fonction build
         mock_service = MagicMock()
@@ -26,11 +32,70 @@ class TestOAuth(unittest.TestCase):
         client = ymu.authenticate_with_oauth()
 
         # Vérifications
-        mock_exists.assert_called_once_with('token.pickle')
-        mock_open.assert_called_once_with('token.pickle', 'rb')
-        mock_pickle_load.assert_called_once()
+        mock_exists.assert_called_once_with('token.json')
+        mock_from_file.assert_called_once_with('token.json', ymu.SCOPES)
         mock_flow.assert_not_called()  # Le flux OAuth ne devrait pas être appelé si le token est valide
         mock_build.assert_called_once_with('youtube', 'v3', credentials=mock_credentials)
 
+    @patch('youtube_mass_updater.save_credentials')
+    @patch('os.path.exists', side_effect=lambda path: path == 'token.pickle')
+    @patch('builtins.open', new_callable=mock_open, read_data="mocked_data")
+    @patch('pickle.load')
+    def test_legacy_pickle_token_is_converted_to_json(self, mock_pickle_load, mock_open, mock_exists, mock_save):
+        mock_credentials = MagicMock()
+        mock_credentials.valid = True
+        mock_credentials.expiry = None
+        mock_pickle_load.return_value = mock_credentials
+
+        self.assertIs(ymu.load_credentials('token.pickle'), mock_credentials)
+
+        mock_open.assert_called_once_with('token.pickle', 'rb')
+        mock_save.assert_called_once_with(mock_credentials, 'token.json')
+
+    def test_credentials_are_refreshed_before_they_expire_and_saved(self):
+        from google.oauth2.credentials import Credentials
+        expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(minutes=4)
+        creds = Credentials("old", refresh_token="refresh", token_uri="https://oauth2.googleapis.com/token",
+                            client_id="id", client_secret="secret", scopes=ymu.SCOPES, expiry=expiry)
+        self.assertTrue(creds.valid)
+
+        def refresh(self, request):
+            self.token = "new"
+            self.expiry = expiry + datetime.timedelta(hours=1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            token_file = os.path.join(tmp, 'token.json')
+            ymu.save_credentials(creds, token_file)
+            self.assertEqual(os.stat(token_file).st_mode & 0o777, 0o600)
+            with patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh) as mock_refresh:
+                loaded = ymu.load_credentials(token_file, interactive=False)
+                ymu.load_credentials(token_file, interactive=False)  # Saved fresh: no second refresh
+
+            self.assertEqual(mock_refresh.call_count, 1)
+            self.assertEqual(loaded.token, "new")
+            with open(token_file) as f:
+                self.assertEqual(json.load(f)["token"], "new")
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_does_not_load_the_api_client_libraries(self):
+        heavy_modules = ['googleapiclient.discovery', 'google_auth_oauthlib', 'google.auth.transport.requests', 'httplib2', 'requests']
+        loaded = subprocess.run(
+            [sys.executable, '-c', f"import sys, youtube_mass_updater; print([m for m in {heavy_modules!r} if m in sys.modules])"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+        self.assertEqual(loaded, "[]")
+
+    def test_clients_share_one_read_of_the_discovery_document(self):
+        from google.oauth2.credentials import Credentials
+        ymu.DISCOVERY_DOCUMENTS.clear()
+        with patch('googleapiclient.discovery_cache.get_static_doc', wraps=__import__('googleapiclient.discovery_cache', fromlist=['x']).get_static_doc) as read:
+            first = ymu.build('youtube', 'v3', credentials=Credentials("token"))
+            second = ymu.build('youtube', 'v3', credentials=Credentials("token"))
+        self.assertEqual(read.call_count, 1)
+        self.assertIsNot(first, second)
+        self.assertTrue(hasattr(second.videos(), 'list'))
+
 if __name__ == "__main__":
     unittest.main(exit=False)
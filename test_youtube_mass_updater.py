@@ -1,9 +1,26 @@
 import unittest
 import datetime
+import os
+import sqlite3
+import tempfile
+import json
+import asyncio
 import youtube_mass_updater as ymu
 
+import httplib2
+from googleapiclient.errors import HttpError
 from youtube_mass_updater import load_configurations, validate_configurations, process_video_title, calculate_publish_time, is_valid_date_format,get_latest_date_plus_one_day
 
+def setUpModule():
+    # No throttling or backoff delays in tests
+    ymu.configure_request_executor(rate_limit=100000, base_delay=0)
+
+
+def make_http_error(status, reason):
+    content = '{"error": {"errors": [{"reason": "%s"}], "message": "%s"}}' % (reason, reason)
+    return HttpError(httplib2.Response({'status': status}), content.encode())
+
+
 class TestYoutubeScheduler(unittest.TestCase):
 
     def test_load_configurations(self):
@@ -40,7 +57,7 @@ class TestYoutubeScheduler(unittest.TestCase):
         self.assertFalse(validate_configurations(invalid_config))
 
     def test_process_video_title(self):
-        video = {'snippet': {'title': 'Video'}}
+        video = ymu.VideoRecord('1', 'Video')
         prefix = "Prefix_"
         suffix = "_Suffix"
         self.assertEqual(process_video_title(video, prefix, suffix), "Prefix_Video_Suffix")
@@ -67,8 +84,8 @@ class TestYoutubeScheduler(unittest.TestCase):
 
     def test_get_latest_date_plus_one_day_with_scheduled_videos(self):
         scheduled_videos = [
-            {'status': {'publishAt': '2023-10-19T12:00:00.000Z'}},
-            {'status': {'publishAt': '2023-10-20T12:00:00.000Z'}},
+            ymu.VideoRecord('1', '1', publish_at='2023-10-19T12:00:00.000Z'),
+            ymu.VideoRecord('2', '2', publish_at='2023-10-20T12:00:00.000Z'),
         ]
         expected_date = datetime.datetime(2023, 10, 21, 0, 0, 0, 0)  # La date attendue est un jour après la date la plus récente
 
@@ -121,8 +138,924 @@ class TestYouTubeAPIInteractions(unittest.TestCase):
         self.assertEqual(len(scheduled_videos), 0)  # Assuming no videos are scheduled
 
         # Check if the videos are sorted correctly
-        self.assertEqual(draft_videos[0]['snippet']['title'], 'Video 1')
-        self.assertEqual(draft_videos[1]['snippet']['title'], 'Video 2')
+        self.assertEqual(draft_videos[0].title, 'Video 1')
+        self.assertEqual(draft_videos[1].title, 'Video 2')
+
+
+    def test_get_all_draft_videos_from_uploads_playlist(self):
+        youtube = MagicMock()
+        youtube.channels().list().execute.return_value = {
+            'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UU123'}}}]
+        }
+        youtube.playlistItems().list().execute.side_effect = [
+            {'items': [{'snippet': {'title': '2', 'resourceId': {'videoId': 'b'}}}], 'nextPageToken': 'page2'},
+            {'items': [{'snippet': {'title': '1', 'resourceId': {'videoId': 'a'}}},
+                       {'snippet': {'title': '999', 'resourceId': {'videoId': 'z'}}}]},
+        ]
+        youtube.videos().list().execute.return_value = {
+            'items': [
+                {'id': 'b', 'snippet': {'title': '2'}, 'status': {'privacyStatus': 'private'}},
+                {'id': 'a', 'snippet': {'title': '1'}, 'status': {'privacyStatus': 'private'}},
+            ]
+        }
+
+        draft_videos, scheduled_videos = ymu.get_all_draft_videos(youtube, discovery_mode="uploads")
+
+        self.assertEqual([video.id for video in draft_videos], ['a', 'b'])
+        youtube.search().list.assert_not_called()
+        youtube.videos().list.assert_called_with(part="snippet,status", id="b,a", fields=ymu.VIDEO_FIELDS)
+
+    def test_video_records_keep_only_the_used_fields(self):
+        video = ymu.video_record({
+            'id': 'a', 'snippet': {'title': 'Episode 12', 'categoryId': '22', 'thumbnails': {}},
+            'status': {'privacyStatus': 'private', 'publishAt': '2023-10-20T12:00:00Z'}
+        })
+
+        self.assertEqual(video, ymu.VideoRecord('a', 'Episode 12', 12, 'private', '2023-10-20T12:00:00Z', '22'))
+        self.assertTrue(video.is_scheduled)
+        self.assertFalse(video.is_draft)
+        self.assertFalse(hasattr(video, '__dict__'))
+
+    def test_get_all_draft_videos_falls_back_to_search(self):
+        youtube = MagicMock()
+        youtube.channels().list().execute.return_value = {'items': []}
+        youtube.search().list().execute.return_value = {
+            'items': [{'id': {'videoId': '1'}, 'snippet': {'title': 'Video 1'}}]
+        }
+        youtube.videos().list().execute.return_value = {
+            'items': [{'id': '1', 'snippet': {'title': 'Video 1'}, 'status': {'privacyStatus': 'private'}}]
+        }
+
+        draft_videos, _ = ymu.get_all_draft_videos(youtube, max_results=400, discovery_mode="uploads")
+
+        self.assertEqual(len(draft_videos), 1)
+        # Search pages are capped at the API maximum of 50 results
+        youtube.search().list.assert_called_with(part="snippet", type="video", forMine=True, maxResults=50, pageToken=None, fields=ymu.SEARCH_FIELDS)
+
+
+class FakeBatch:
+    """Stand-in for BatchHttpRequest that replays a response or an error per request."""
+
+    def __init__(self, callback, errors):
+        self.callback = callback
+        self.errors = errors
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        for request_id, request in self.requests:
+            error = self.errors.get(request_id)
+            if isinstance(error, list):
+                # One error per attempt, then success
+                error = error.pop(0) if error else None
+            self.callback(request_id, None if error else {"id": request_id}, error)
+
+
+class TestBatchRequests(unittest.TestCase):
+
+    def setUp(self):
+        ymu.load_quota_ledger()
+
+    def make_youtube(self, errors=None):
+        youtube = MagicMock()
+        youtube.batches = []
+
+        def new_batch_http_request(callback):
+            batch = FakeBatch(callback, errors or {})
+            youtube.batches.append(batch)
+            return batch
+
+        youtube.new_batch_http_request.side_effect = new_batch_http_request
+        return youtube
+
+    def test_execute_batch_splits_on_batch_limit(self):
+        youtube = self.make_youtube()
+        keyed_requests = [(str(i), MagicMock()) for i in range(120)]
+
+        results = ymu.execute_batch(youtube, keyed_requests)
+
+        self.assertEqual([len(batch.requests) for batch in youtube.batches], [50, 50, 20])
+        self.assertEqual(len(results), 120)
+        self.assertTrue(all(error is None for _, error in results.values()))
+
+    def test_playlist_position(self):
+        self.assertEqual(ymu.build_playlist_item_body("PL", "a")["snippet"]["position"], 0)
+        appended = ymu.build_playlist_item_body("PL", "a", ymu.playlist_position({"PLAYLIST_POSITION": "end"}))
+        self.assertNotIn("position", appended["snippet"])
+
+    def test_playlist_members_are_listed_once_and_kept_up_to_date(self):
+        youtube = MagicMock()
+        youtube.playlistItems().list().execute.side_effect = [
+            {'items': [{'contentDetails': {'videoId': 'a'}}], 'nextPageToken': 'p2'},
+            {'items': [{'contentDetails': {'videoId': 'b'}}]},
+        ]
+        ymu.PLAYLIST_MEMBERS.clear()
+        videos_to_update = [(ymu.VideoRecord(video_id, '1'), None, None) for video_id in 'abc']
+
+        self.assertEqual(ymu.member_steps(youtube, "PL", videos_to_update), {('a', "playlist_insert"), ('b', "playlist_insert")})
+        ymu.add_playlist_member("PL", "c")
+        self.assertEqual(len(ymu.member_steps(youtube, "PL", videos_to_update)), 3)
+        self.assertEqual(youtube.playlistItems().list().execute.call_count, 2)
+        ymu.PLAYLIST_MEMBERS.clear()
+
+    def test_batch_update_videos_reports_per_item_failures(self):
+        youtube = self.make_youtube(errors={'2': Exception("backendError")})
+        config = {"DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"], "PLAYLIST_ID": "PLAYLIST123"}
+        publish_time = datetime.datetime(2023, 10, 17, 5)
+        videos_to_update = [
+            (ymu.VideoRecord('1', '1'), 'Prefix 1', publish_time),
+            (ymu.VideoRecord('2', '2'), 'Prefix 2', publish_time),
+            (ymu.VideoRecord('3', '3'), 'x' * 101, publish_time),
+        ]
+
+        report = ymu.batch_update_videos(youtube, videos_to_update, config, "24")
+
+        self.assertEqual(report['1'], {"update": "ok", "playlist_insert": "ok", "error": None})
+        self.assertEqual(report['2']["update"], "failed")
+        self.assertEqual(report['2']["playlist_insert"], "skipped")
+        self.assertEqual(report['3']["update"], "skipped")
+        # One batch for the updates, then the single playlist insert on its own
+        self.assertEqual([len(batch.requests) for batch in youtube.batches], [2])
+        youtube.playlistItems().insert.assert_called_once()
+
+
+    def test_update_videos_concurrent_batches_keep_order(self):
+        clients = []
+
+        def client_factory():
+            client = self.make_youtube()
+            clients.append(client)
+            return client
+
+        config = {
+            "DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"], "PLAYLIST_ID": "PLAYLIST123",
+            "CONCURRENCY": 4,
+        }
+        youtube = MagicMock()
+        publish_time = datetime.datetime(2023, 10, 17, 5)
+        videos_to_update = [(ymu.VideoRecord(str(i), str(i)), f'Prefix {i}', publish_time) for i in range(120)]
+
+        report = ymu.update_videos_in_batches(youtube, videos_to_update, config, '24', client_factory)
+
+        self.assertEqual(list(report), [str(i) for i in range(120)])
+        self.assertTrue(all(result["playlist_insert"] == "ok" for result in report.values()))
+        self.assertLessEqual(len(clients), 4)
+        youtube.new_batch_http_request.assert_not_called()
+
+
+class TestConcurrentExecution(unittest.TestCase):
+
+    def test_run_concurrently_returns_results_in_order(self):
+        results = ymu.run_concurrently(MagicMock, lambda client, item: item * 2, list(range(20)), 4)
+        self.assertEqual(results, [item * 2 for item in range(20)])
+
+
+class TestAsyncBackend(unittest.TestCase):
+
+    def setUp(self):
+        ymu.load_quota_ledger()
+        ymu.PLAYLIST_MEMBERS.clear()
+
+    def test_sync_wrappers_reuse_one_loop_and_pool_even_inside_a_running_loop(self):
+        async def current_loop():
+            return asyncio.get_running_loop()
+
+        first = ymu.run_async(current_loop())
+        second = ymu.run_async(current_loop(), max_in_flight=4)
+        executor = ymu.ASYNC_RUNNER["executor"]
+        ymu.run_async(current_loop(), max_in_flight=2)
+
+        self.assertIs(first, second)
+        self.assertIs(ymu.ASYNC_RUNNER["executor"], executor)
+
+        youtube = MagicMock()
+
+        async def caller():
+            # A synchronous wrapper called from a coroutine blocks that loop instead of raising
+            return ymu.add_to_playlist(youtube, "PL", "a")
+
+        asyncio.run(caller())
+        youtube.playlistItems().insert().execute.assert_called_once()
+
+    def test_pooled_http_answers_like_httplib2(self):
+        http = ymu.PooledHttp(pool_size=4)
+        answer = MagicMock(status_code=404, headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}, content=b'{}')
+        with patch.object(http.session, 'request', return_value=answer) as request:
+            response, content = http.request('http://example.com/videos', 'PUT', body='{}', headers={'a': 'b'})
+
+        self.assertEqual((response.status, content), (404, b'{}'))
+        self.assertNotIn('content-encoding', response)
+        request.assert_called_once_with('PUT', 'http://example.com/videos', data='{}', headers={'a': 'b'}, timeout=60)
+
+    def test_update_videos_async_stops_starting_videos_once_the_quota_is_exceeded(self):
+        youtube = MagicMock()
+        youtube.videos().update().execute.side_effect = [{}, make_http_error(403, "quotaExceeded")]
+        config = {"DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"], "PLAYLIST_ID": "PL", "JOURNAL_FILE": ""}
+        publish_time = datetime.datetime(2023, 10, 17, 5)
+        videos_to_update = [(ymu.VideoRecord(str(i), str(i)), f'Prefix {i}', publish_time) for i in range(1, 4)]
+
+        report = ymu.run_async(ymu.update_videos_async(youtube, videos_to_update, config, "24"))
+
+        # Inserts come after the updates, so none is sent once the quota is exceeded
+        self.assertEqual(report['1'], {"update": "ok", "playlist_insert": "skipped", "error": None})
+        self.assertEqual(report['2']["update"], "failed")
+        self.assertEqual(report['3'], {"update": "skipped", "playlist_insert": "skipped", "error": None})
+        self.assertEqual(ymu.PLAYLIST_MEMBERS, {})
+        youtube.playlistItems().insert.assert_not_called()
+
+
+
+class TestVideoCategories(unittest.TestCase):
+
+    def setUp(self):
+        ymu.CATEGORY_CACHE.clear()
+        self.youtube = MagicMock()
+        self.youtube.videoCategories().list().execute.return_value = {
+            'items': [{'id': '24', 'snippet': {'title': 'Entertainment'}}, {'id': '10', 'snippet': {'title': 'Music'}}]
+        }
+        self.youtube.videoCategories().list.reset_mock()
+
+    def tearDown(self):
+        ymu.CATEGORY_CACHE.clear()
+
+    def test_resolve_category_by_name_or_id_fetches_once(self):
+        self.assertEqual(ymu.resolve_category_id(self.youtube, {"VIDEO_CATEGORY": "Music"}), '10')
+        self.assertEqual(ymu.resolve_category_id(self.youtube, {"VIDEO_CATEGORY": "24"}), '24')
+        self.youtube.videoCategories().list.assert_called_once()
+
+    def test_resolve_unknown_category_returns_none(self):
+        self.assertIsNone(ymu.resolve_category_id(self.youtube, {"VIDEO_CATEGORY": "Cooking"}))
+
+    def test_category_cache_file_skips_api_call(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_file = os.path.join(tmp, 'categories_cache.json')
+            config = {"CATEGORY_CACHE_FILE": cache_file, "CATEGORY_CACHE_TTL": 3600}
+            self.assertEqual(ymu.resolve_category_id(self.youtube, config), '24')
+            ymu.CATEGORY_CACHE.clear()
+
+            self.assertEqual(ymu.resolve_category_id(self.youtube, config), '24')
+            self.youtube.videoCategories().list.assert_called_once()
+            self.assertEqual(os.listdir(tmp), ['categories_cache.json'])
+
+    def test_unknown_category_aborts_with_an_empty_report(self):
+        video = ymu.VideoRecord('a', '1')
+        config = {"VIDEO_CATEGORY": "Cooking", "PLAYLIST_ID": "PL"}
+        self.assertEqual(ymu.execute_updates(self.youtube, [(video, 'Episode 1', datetime.datetime(2030, 1, 1, 9))], config), {})
+        self.youtube.videos().update.assert_not_called()
+
+
+class TestRunJournal(unittest.TestCase):
+
+    def test_resume_skips_finished_steps_and_keeps_publish_times(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal_file = os.path.join(tmp, 'run_journal.jsonl')
+            publish_time = datetime.datetime(2023, 10, 17, 5)
+            videos_to_update = [
+                (ymu.VideoRecord('a', '1'), 'Prefix 1', publish_time),
+                (ymu.VideoRecord('b', '2'), 'Prefix 2', publish_time + datetime.timedelta(hours=8)),
+                (ymu.VideoRecord('c', '3'), 'Prefix 3', publish_time + datetime.timedelta(days=1)),
+            ]
+            ymu.start_journal(journal_file, videos_to_update)
+            ymu.record_step(journal_file, 'a', 'update')
+            ymu.record_step(journal_file, 'a', 'playlist_insert')
+            ymu.record_step(journal_file, 'b', 'update')
+            with open(journal_file, 'a') as f:
+                f.write('{"event": "done", "vid')  # Run killed mid-write
+
+            planned, done_steps = ymu.load_journal(journal_file)
+            self.assertEqual(planned, videos_to_update)
+
+            youtube = TestBatchRequests().make_youtube()
+            config = {"DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"], "PLAYLIST_ID": "PLAYLIST123", "JOURNAL_FILE": journal_file}
+            report = ymu.batch_update_videos(youtube, planned, config, "24", done_steps)
+
+            self.assertEqual(report['a'], {"update": "done", "playlist_insert": "done", "error": None})
+            self.assertEqual(report['b'], {"update": "done", "playlist_insert": "ok", "error": None})
+            self.assertEqual(report['c'], {"update": "ok", "playlist_insert": "ok", "error": None})
+            # Only c is updated; b and c are inserted
+            self.assertEqual([len(batch.requests) for batch in youtube.batches], [1])
+            self.assertEqual(youtube.playlistItems().insert.call_count, 2)
+            _, done_steps = ymu.load_journal(journal_file)
+            self.assertEqual(len(done_steps), 6)
+
+    def test_resume_returns_the_report_of_the_pending_videos(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal_file = os.path.join(tmp, 'run_journal.jsonl')
+            config = {"JOURNAL_FILE": journal_file}
+            self.assertIsNone(ymu.resume_updates(MagicMock(), config))
+
+            publish_time = datetime.datetime(2023, 10, 17, 5)
+            videos_to_update = [(ymu.VideoRecord(video_id, '1'), 'Prefix 1', publish_time) for video_id in 'ab']
+            ymu.start_journal(journal_file, videos_to_update)
+            ymu.record_step(journal_file, 'a', 'update')
+            ymu.record_step(journal_file, 'a', 'playlist_insert')
+            pending_report = {'b': {"update": "ok", "playlist_insert": "ok", "error": None}}
+            with patch('youtube_mass_updater.refresh_video_states'), \
+                 patch('youtube_mass_updater.execute_updates', return_value=pending_report) as execute_updates:
+                self.assertEqual(ymu.resume_updates(MagicMock(), config), pending_report)
+            self.assertEqual(execute_updates.call_args.args[1], videos_to_update[1:])
+
+    def test_load_journal_without_file(self):
+        self.assertIsNone(ymu.load_journal(os.path.join(tempfile.gettempdir(), 'missing_journal.jsonl')))
+
+    def test_streamed_plan_entries_are_appended(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            journal_file = os.path.join(tmp, 'run_journal.jsonl')
+            publish_time = datetime.datetime(2023, 10, 17, 5)
+            first = [(ymu.VideoRecord('a', '1'), 'Prefix 1', publish_time)]
+            second = [(ymu.VideoRecord('b', '2'), 'Prefix 2', publish_time + datetime.timedelta(hours=8))]
+            ymu.start_journal(journal_file, [])
+            ymu.extend_journal(journal_file, first)
+            ymu.extend_journal(journal_file, second)
+
+            planned, done_steps = ymu.load_journal(journal_file)
+            self.assertEqual(planned, first + second)
+
+
+
+class TestQuotaLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger_file = os.path.join(self.tmp.name, 'quota_ledger.json')
+        ymu.load_quota_ledger(self.ledger_file, daily_quota=1000)
+
+    def tearDown(self):
+        ymu.load_quota_ledger()
+        self.tmp.cleanup()
+
+    def test_charges_are_persisted_for_the_quota_day(self):
+        ymu.charge_quota("search.list")
+        ymu.charge_quota("videos.update", 3)
+        ymu.save_quota_ledger()
+        ymu.load_quota_ledger(self.ledger_file, daily_quota=1000)
+
+        self.assertEqual(ymu.remaining_quota(), 1000 - 100 - 150)
+        self.assertEqual(ymu.QUOTA_LEDGER["calls"], {"search.list": 1, "videos.update": 3})
+
+    def test_ledger_is_saved_once_per_request_and_never_truncated(self):
+        ymu.configure_request_executor(rate_limit=100000, base_delay=0)
+        request = MagicMock()
+        request.execute.side_effect = [HttpError(httplib2.Response({'status': 503}), b'{}'), {}]
+        with patch('youtube_mass_updater.os.replace', wraps=os.replace) as replace:
+            ymu.execute_request(request, "videos.update")
+        self.assertEqual(replace.call_count, 1)  # Two attempts, one write
+        with open(self.ledger_file) as f:
+            self.assertEqual(json.load(f)["used"], 100)
+
+        # A run killed while writing leaves the previous ledger in place
+        ymu.charge_quota("videos.update")
+        with patch('youtube_mass_updater.os.replace', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                ymu.save_quota_ledger()
+        ymu.load_quota_ledger(self.ledger_file, daily_quota=1000)
+        self.assertEqual(ymu.remaining_quota(), 900)
+
+    def test_ledger_from_a_previous_day_is_ignored(self):
+        with open(self.ledger_file, 'w') as f:
+            f.write('{"day": "2000-01-01", "used": 900, "calls": {}}')
+        ymu.load_quota_ledger(self.ledger_file, daily_quota=1000)
+        self.assertEqual(ymu.remaining_quota(), 1000)
+
+    def test_quota_day_uses_pacific_time(self):
+        now = datetime.datetime(2023, 10, 18, 5, 0, tzinfo=datetime.timezone.utc)
+        self.assertEqual(ymu.quota_day(now), '2023-10-17')
+
+    def test_select_within_quota_queues_the_rest(self):
+        publish_time = datetime.datetime(2023, 10, 17, 5)
+        videos_to_update = [(ymu.VideoRecord(str(i), str(i)), str(i), publish_time) for i in range(15)]
+
+        selected, queued = ymu.select_within_quota(videos_to_update, {('0', 'update')}, reserve=100)
+
+        # 900 units: the first video only needs its playlist insert, the others need 100 units each
+        self.assertEqual(len(selected), 9)
+        self.assertEqual(len(queued), 6)
+
+    def test_execute_batch_stops_when_quota_is_exceeded(self):
+        quota_error = make_http_error(403, "quotaExceeded")
+        youtube = TestBatchRequests().make_youtube(errors={'3': quota_error})
+        keyed_requests = [(str(i), MagicMock()) for i in range(120)]
+
+        results = ymu.execute_batch(youtube, keyed_requests, method="videos.update")
+
+        self.assertEqual(len(youtube.batches), 1)
+        self.assertEqual(len(results), 50)
+        self.assertEqual(ymu.QUOTA_LEDGER["calls"], {"videos.update": 50})
+
+
+
+class TestRequestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        ymu.load_quota_ledger()
+
+    def test_retries_transient_errors(self):
+        request = MagicMock()
+        request.execute.side_effect = [make_http_error(503, "backendError"), make_http_error(403, "rateLimitExceeded"), {"items": []}]
+
+        self.assertEqual(ymu.execute_request(request, "videos.list"), {"items": []})
+        self.assertEqual(request.execute.call_count, 3)
+        self.assertEqual(ymu.QUOTA_LEDGER["calls"], {"videos.list": 3})
+
+    def test_raises_permanent_errors_without_retrying(self):
+        request = MagicMock()
+        request.execute.side_effect = make_http_error(403, "forbidden")
+
+        with self.assertRaises(HttpError):
+            ymu.execute_request(request, "videos.update")
+        request.execute.assert_called_once()
+
+    def test_gives_up_after_max_retries(self):
+        request = MagicMock()
+        request.execute.side_effect = make_http_error(500, "internalError")
+
+        with self.assertRaises(HttpError):
+            ymu.execute_request(request, "videos.list")
+        self.assertEqual(request.execute.call_count, ymu.REQUEST_SETTINGS["max_retries"] + 1)
+
+    def test_execute_batch_retries_only_failed_items(self):
+        youtube = TestBatchRequests().make_youtube(errors={'1': [make_http_error(503, "backendError")]})
+
+        results = ymu.execute_batch(youtube, [('0', MagicMock()), ('1', MagicMock())])
+
+        self.assertEqual([[key for key, _ in batch.requests] for batch in youtube.batches], [['0', '1'], ['1']])
+        self.assertIsNone(results['1'][1])
+
+    def test_update_video_raises_instead_of_swallowing_errors(self):
+        youtube = MagicMock()
+        youtube.videos().update().execute.side_effect = make_http_error(400, "invalidPublishAt")
+        config = {"TITLE_PREFIX": "Prefix ", "TITLE_SUFFIX": "", "DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"]}
+
+        with patch('youtube_mass_updater.resolve_category_id', return_value='24'):
+            with self.assertRaises(HttpError):
+                ymu.update_video(youtube, ymu.VideoRecord('1', '1'), datetime.datetime(2023, 10, 17, 5), config)
+
+
+class TestRunMetrics(unittest.TestCase):
+
+    def setUp(self):
+        ymu.load_quota_ledger()
+        ymu.reset_metrics()
+
+    def test_execute_request_records_calls_errors_retries_and_bytes(self):
+        request = MagicMock()
+        request.postproc = lambda resp, content: {"items": []}
+        outcomes = [make_http_error(503, "backendError"), None]
+
+        def execute():
+            outcome = outcomes.pop(0)
+            if outcome:
+                raise outcome
+            return request.postproc(None, b'{"items": []}')
+        request.execute.side_effect = execute
+
+        ymu.execute_request(request, "videos.list")
+
+        metrics = ymu.METRICS["videos.list"]
+        self.assertEqual((metrics["calls"], metrics["errors"], metrics["retries"], metrics["quota"]), (2, 1, 1, 2))
+        self.assertEqual(metrics["bytes"], len(b'{"items": []}'))
+        self.assertEqual(sum(metrics["latency_buckets"]), 2)
+
+    def test_not_modified_is_not_an_error(self):
+        ymu.execute_conditional_request(FakeConditionalRequest({'etag': 'e1'}, []), "videos.list", 'e1')
+        self.assertEqual(ymu.METRICS["videos.list"]["errors"], 0)
+
+    def test_execute_batch_records_one_http_request_per_batch(self):
+        youtube = TestBatchRequests().make_youtube(errors={'1': [make_http_error(503, "backendError")]})
+
+        ymu.execute_batch(youtube, [('0', MagicMock()), ('1', MagicMock())], method="videos.update")
+
+        metrics = ymu.METRICS["videos.update"]
+        self.assertEqual((metrics["http_requests"], metrics["calls"], metrics["errors"], metrics["retries"]), (2, 3, 1, 1))
+
+    def test_exports_prometheus_and_json(self):
+        ymu.record_api_call("videos.update", 0.2, calls=3)
+        ymu.record_api_call("videos.update", 7.0, errors=1)
+        self.assertEqual(ymu.latency_quantile(ymu.METRICS["videos.update"], 0.5), 0.25)
+
+        with tempfile.TemporaryDirectory() as directory:
+            ymu.write_metrics(os.path.join(directory, 'metrics.prom'))
+            with open(os.path.join(directory, 'metrics.prom')) as f:
+                prometheus = f.read()
+            ymu.write_metrics(os.path.join(directory, 'metrics.json'))
+            with open(os.path.join(directory, 'metrics.json')) as f:
+                saved = json.load(f)
+
+        self.assertIn('youtube_api_calls_total{method="videos.update"} 4', prometheus)
+        self.assertIn('youtube_api_quota_units_total{method="videos.update"} 200', prometheus)
+        self.assertIn('youtube_api_request_duration_seconds_bucket{method="videos.update",le="0.25"} 1', prometheus)
+        self.assertIn('youtube_api_request_duration_seconds_bucket{method="videos.update",le="+Inf"} 2', prometheus)
+        self.assertEqual(saved["methods"]["videos.update"]["errors"], 1)
+        self.assertIn("videos.update", ymu.format_metrics_table())
+
+
+
+class TestStreamingPipeline(unittest.TestCase):
+
+    def test_details_keep_the_requested_order(self):
+        youtube = MagicMock()
+        youtube.videos().list().execute.return_value = {'items': [
+            {'id': 'b', 'snippet': {'title': 'Part 2'}, 'status': {'privacyStatus': 'private'}},
+            {'id': 'a', 'snippet': {'title': 'Part 1'}, 'status': {'privacyStatus': 'public'}},
+        ]}
+        details = list(ymu.iter_video_details(youtube, iter([(1, 'a'), (2, 'b'), (3, 'gone')])))
+        self.assertEqual(details, [
+            (1, ymu.VideoRecord('a', 'Part 1', 1, 'public')),
+            (2, ymu.VideoRecord('b', 'Part 2', 2, 'private')),
+        ])
+        youtube.videos().list.assert_called_with(part="snippet,status", id="a,b,gone", fields=ymu.VIDEO_FIELDS)
+
+    def test_prefetch_runs_the_producer_on_its_own_client_and_forwards_errors(self):
+        clients = []
+
+        def factory():
+            clients.append(object())
+            return clients[-1]
+
+        def failing(client):
+            yield client
+            raise ConnectionError("lost")
+
+        stream = ymu.prefetch(failing, factory)
+        self.assertIs(next(stream), clients[0])
+        with self.assertRaises(ConnectionError):
+            next(stream)
+
+
+class FakeConditionalRequest:
+    """Request answering 304 when If-None-Match matches the ETag of its response."""
+
+    def __init__(self, response, log):
+        self.response = response
+        self.headers = {}
+        self.log = log
+
+    def execute(self):
+        not_modified = self.headers.get('If-None-Match') == self.response['etag']
+        self.log.append(not_modified)
+        if not_modified:
+            raise HttpError(httplib2.Response({'status': 304}), b'')
+        return self.response
+
+
+class TestChannelInventory(unittest.TestCase):
+
+    def setUp(self):
+        ymu.load_quota_ledger()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'inventory.sqlite3')
+        self.log = []
+        self.page = {
+            'etag': 'page-v1',
+            'items': [
+                {'snippet': {'title': '1', 'resourceId': {'videoId': 'a'}}},
+                {'snippet': {'title': '2', 'resourceId': {'videoId': 'b'}}},
+            ]
+        }
+        self.details = {
+            'etag': 'details-v1',
+            'items': [
+                {'id': 'a', 'snippet': {'title': '1'}, 'status': {'privacyStatus': 'private'}},
+                {'id': 'b', 'snippet': {'title': '2'}, 'status': {'privacyStatus': 'private', 'publishAt': '2023-10-20T12:00:00Z'}},
+            ]
+        }
+        self.youtube = MagicMock()
+        self.youtube.channels().list().execute.return_value = {
+            'items': [{'contentDetails': {'relatedPlaylists': {'uploads': 'UU123'}}}]
+        }
+        self.youtube.playlistItems().list.side_effect = lambda **kwargs: FakeConditionalRequest(self.page, self.log)
+        self.youtube.videos().list.side_effect = lambda **kwargs: FakeConditionalRequest(self.details, self.log)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_second_sync_reuses_unchanged_pages(self):
+        first = ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+        second = ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+
+        self.assertEqual(first, second)
+        draft_videos, scheduled_videos = second
+        self.assertEqual([video.id for video in draft_videos], ['a'])
+        self.assertEqual(scheduled_videos[0].publish_at, '2023-10-20T12:00:00Z')
+        # First sync fetches the page and the details; the second one gets two 304s
+        self.assertEqual(self.log, [False, False, True, True])
+
+    def test_inventory_of_an_older_version_gains_the_snippet_digest(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.executescript(ymu.INVENTORY_SCHEMA.replace(",\n    snippet_digest TEXT", ""))
+        connection.execute("CREATE TABLE detail_chunks (video_ids TEXT PRIMARY KEY, etag TEXT NOT NULL)")
+        connection.execute("INSERT INTO detail_chunks VALUES ('a,b', 'details-v1')")
+        connection.execute("INSERT INTO detail_ranges VALUES (0, 0, 'details-v1')")
+        connection.commit()
+        connection.close()
+        self.details['items'][0]['snippet'].update(description='', categoryId='22')
+
+        draft_videos, _ = ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+
+        self.assertEqual(draft_videos[0].snippet_digest, ymu.snippet_digest('1', '', None, '22'))
+        connection = sqlite3.connect(self.db_path)
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        connection.close()
+        self.assertNotIn('detail_chunks', tables)
+
+    def test_new_upload_only_refetches_the_chunk_of_its_number_range(self):
+        new_details = {
+            'etag': 'details-new',
+            'items': [{'id': 'z', 'snippet': {'title': '60'}, 'status': {'privacyStatus': 'private'}}]
+        }
+        self.youtube.videos().list.side_effect = lambda **kwargs: FakeConditionalRequest(
+            new_details if kwargs['id'] == 'z' else self.details, self.log
+        )
+        ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+        # A new upload whose ID sorts before the others, in a later number range
+        self.page = {'etag': 'page-v2', 'items': [{'snippet': {'title': '60', 'resourceId': {'videoId': 'z'}}}] + self.page['items']}
+        self.log.clear()
+
+        draft_videos, _ = ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+
+        self.assertEqual([video.id for video in draft_videos], ['a', 'z'])
+        # Page refetched, range 0-49 unchanged (304), range 50-99 fetched
+        self.assertEqual(self.log, [False, True, False])
+
+    def test_changed_details_are_refetched(self):
+        ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+        self.details = {
+            'etag': 'details-v2',
+            'items': [
+                {'id': 'a', 'snippet': {'title': '1'}, 'status': {'privacyStatus': 'private', 'publishAt': '2023-10-21T12:00:00Z'}},
+                {'id': 'b', 'snippet': {'title': '2'}, 'status': {'privacyStatus': 'private', 'publishAt': '2023-10-20T12:00:00Z'}},
+            ]
+        }
+
+        draft_videos, scheduled_videos = ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path)
+
+        self.assertEqual(draft_videos, [])
+        self.assertEqual([video.id for video in scheduled_videos], ['a', 'b'])
+
+    def test_failed_sync_falls_back_with_the_configured_discovery(self):
+        with patch('youtube_mass_updater.sync_inventory', return_value=False), \
+             patch('youtube_mass_updater.get_all_draft_videos', return_value=([], [])) as get_all_draft_videos:
+            ymu.get_all_draft_videos_from_inventory(self.youtube, self.db_path, discovery_mode="search", max_in_flight=8)
+
+        self.assertEqual(get_all_draft_videos.call_args.args[-2:], ("search", 8))
+
+
+
+class TestPlanning(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = {
+            "TITLE_PREFIX": "Episode ", "TITLE_SUFFIX": " | Channel", "PLAYLIST_ID": "PLAYLIST123",
+            "START_DATE": datetime.datetime(2023, 10, 17), "FIRST_INTERVAL": (1, 9), "SECOND_INTERVAL": (13, 23),
+            "VIDEOS_PER_DAY": 2, "VIDEO_CATEGORY": "Music", "JOURNAL_FILE": "", "DESCRIPTION": "Description",
+            "VIDEO_TAGS": ["tag"], "SCHEDULE_SEED": 0,
+        }
+        self.videos = [
+            ymu.VideoRecord('a', '1'),
+            ymu.VideoRecord('b', 'Episode 2 | Channel'),
+            ymu.VideoRecord('c', '3' * 100),
+        ]
+        ymu.CATEGORY_CACHE.clear()
+        ymu.PLAYLIST_MEMBERS.clear()
+        self.youtube = MagicMock()
+        self.youtube.videoCategories().list().execute.return_value = {
+            'items': [{'id': '24', 'snippet': {'title': 'Entertainment'}}, {'id': '10', 'snippet': {'title': 'Music'}}]
+        }
+        self.youtube.playlistItems().list().execute.return_value = {'items': []}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        ymu.CATEGORY_CACHE.clear()
+        ymu.PLAYLIST_MEMBERS.clear()
+
+    def test_build_plan_reports_skips_and_quota(self):
+        plan = ymu.build_plan(self.youtube, self.videos, self.config)
+
+        self.assertEqual([entry["title"] for entry in plan["videos"][:2]], ["Episode 1 | Channel", "Episode 2 | Channel"])
+        self.assertEqual(plan["videos"][2]["skip_reason"], "title longer than 100 characters")
+        self.assertEqual(plan["skipped"], 1)
+        self.assertEqual(plan["projected_quota"], 200)
+        self.assertEqual({(entry["description"], tuple(entry["tags"]), entry["category_id"]) for entry in plan["videos"]},
+                         {("Description", ("tag",), "10")})
+
+    def test_projected_quota_leaves_out_unchanged_videos_and_playlist_members(self):
+        self.youtube.playlistItems().list().execute.return_value = {'items': [{'contentDetails': {'videoId': 'b'}}]}
+        first = ymu.build_plan(self.youtube, self.videos, self.config)["videos"][0]
+        video = self.videos[0]
+        video.privacy_status, video.publish_at = "private", first["publish_time"] + "Z"
+        video.snippet_digest = ymu.snippet_digest(first["title"], first["description"], first["tags"], first["category_id"])
+
+        plan = ymu.build_plan(self.youtube, self.videos, self.config)
+
+        self.assertEqual((plan["unchanged"], plan["already_in_playlist"]), (1, 1))
+        # a only needs its insert, b only its update
+        self.assertEqual(plan["projected_quota"], 100)
+
+    def test_build_plan_refuses_an_unknown_category(self):
+        self.assertIsNone(ymu.build_plan(self.youtube, self.videos, dict(self.config, VIDEO_CATEGORY="Cooking")))
+
+    def test_apply_replays_the_written_plan(self):
+        plan_file = os.path.join(self.tmp.name, 'plan.json')
+        plan = ymu.build_plan(self.youtube, self.videos, self.config)
+        ymu.write_plan(plan, plan_file)
+
+        config = dict(self.config, PLAYLIST_ID="OTHER", VIDEO_CATEGORY="Entertainment", DESCRIPTION="Changed", VIDEO_TAGS=["changed"])
+        with patch('youtube_mass_updater.execute_updates') as mock_execute_updates:
+            ymu.apply_plan(MagicMock(), plan_file, config)
+
+        videos_to_update = mock_execute_updates.call_args[0][1]
+        self.assertEqual([(video.id, title, publish_time.isoformat()) for video, title, publish_time in videos_to_update],
+                         [(entry["video_id"], entry["title"], entry["publish_time"]) for entry in plan["videos"][:2]])
+        self.assertEqual([video.metadata for video, _, _ in videos_to_update], [{"description": "Description", "tags": ["tag"]}] * 2)
+        self.assertEqual(config["PLAYLIST_ID"], "PLAYLIST123")
+        self.assertEqual(config["VIDEO_CATEGORY"], "10")
+
+    def test_write_plan_as_csv(self):
+        plan_file = os.path.join(self.tmp.name, 'plan.csv')
+        ymu.write_plan(ymu.build_plan(self.youtube, self.videos, self.config), plan_file)
+
+        with open(plan_file) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "video_id,source_title,title,publish_time,description,tags,category_id,playlist_id,skip_reason")
+        self.assertEqual(len(lines), 4)
+
+
+
+class TestMetadataTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.metadata_file = os.path.join(self.tmp.name, 'metadata.csv')
+        with open(self.metadata_file, 'w', newline='') as f:
+            f.write("number,guest,topics\n1,Ada,\"math,engines\"\n2,Alan,\n")
+        self.config = {
+            "TITLE_PREFIX": "Episode ", "TITLE_SUFFIX": "", "PLAYLIST_ID": "PLAYLIST123", "DESCRIPTION": "Default",
+            "VIDEO_TAGS": ["default"], "START_DATE": datetime.datetime(2023, 10, 17), "FIRST_INTERVAL": (1, 9),
+            "SECOND_INTERVAL": (13, 23), "VIDEOS_PER_DAY": 2, "JOURNAL_FILE": "",
+            "TITLE_TEMPLATE": "{prefix}{number:03d} with {guest}", "DESCRIPTION_TEMPLATE": "Out on {date:%d/%m}",
+            "TAGS_TEMPLATE": "show,{topics}", "METADATA": ymu.load_metadata_file(self.metadata_file),
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_templates_render_per_video_values(self):
+        videos_to_update, problems = ymu.render_metadata(ymu.plan_updates([ymu.VideoRecord('a', '1'), ymu.VideoRecord('b', '2')], self.config), self.config)
+
+        self.assertEqual(problems, {})
+        (first, first_title, publish_time), (second, second_title, _) = videos_to_update
+        self.assertEqual((first_title, second_title), ("Episode 001 with Ada", "Episode 002 with Alan"))
+        self.assertEqual(first.metadata, {"description": "Out on 17/10", "tags": ["show", "math", "engines"]})
+        self.assertEqual(second.metadata["tags"], ["show"])
+        body = ymu.build_video_update_body('a', first_title, publish_time, self.config, "22", first.metadata)
+        self.assertEqual((body["snippet"]["description"], body["snippet"]["tags"]), ("Out on 17/10", ["show", "math", "engines"]))
+        # The journal keeps the rendered values for --resume
+        self.assertEqual(ymu.planned_video_to_update(ymu.planned_video_entry(*videos_to_update[0]))[0].metadata, first.metadata)
+
+    def test_invalid_videos_are_skipped_and_the_others_sent(self):
+        config = dict(self.config, METADATA={**self.config["METADATA"], 2: {"guest": "x" * 100, "topics": ""}})
+        videos = [ymu.VideoRecord('a', '1'), ymu.VideoRecord('b', '2'), ymu.VideoRecord('c', '3')]
+        ymu.load_quota_ledger()
+        ymu.CATEGORY_CACHE.clear()
+        ymu.PLAYLIST_MEMBERS.clear()
+        youtube = TestBatchRequests().make_youtube()
+        youtube.videoCategories().list().execute.return_value = {'items': [{'id': '24', 'snippet': {'title': 'Entertainment'}}]}
+        youtube.playlistItems().list().execute.return_value = {'items': []}
+
+        with self.assertLogs(level='ERROR') as logs:
+            report = ymu.update_videos(youtube, videos, config)
+
+        self.assertEqual(report['a'], {"update": "ok", "playlist_insert": "ok", "error": None})
+        self.assertEqual((report['b']["update"], report['b']["error"]), ("skipped", "title longer than 100 characters"))
+        self.assertEqual(report['c']["update"], "skipped")
+        self.assertIn("no 'guest' for video 3 in METADATA_FILE", report['c']["error"])
+        self.assertEqual([len(batch.requests) for batch in youtube.batches], [1])
+        self.assertTrue(any("no 'guest' for video 3" in line for line in logs.output))
+        ymu.CATEGORY_CACHE.clear()
+        ymu.PLAYLIST_MEMBERS.clear()
+
+    def test_rejected_titles_log_their_reason(self):
+        with self.assertLogs(level='ERROR') as logs:
+            self.assertFalse(ymu.is_valid_title(ymu.VideoRecord('a', '1'), "Episode <1>"))
+
+        self.assertIn("title contains < or >", logs.output[0])
+        self.assertNotIn("exceeds", logs.output[0])
+
+    def test_unknown_fields_fail_validation(self):
+        with self.assertRaises(ValueError):
+            ymu.compile_metadata_templates(dict(self.config, DESCRIPTION_TEMPLATE="{host}"))
+        self.assertIs(ymu.compile_metadata_templates(self.config)["title"], ymu.compile_metadata_templates(self.config)["title"])
+
+
+class TestDiffAwareUpdates(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {"DESCRIPTION": "Description", "VIDEO_TAGS": ["tag"], "PLAYLIST_ID": "PLAYLIST123", "JOURNAL_FILE": ""}
+        self.publish_time = datetime.datetime(2023, 10, 17, 5)
+        self.snippet = {'title': 'Prefix 1', 'description': 'Description', 'tags': ['tag'], 'categoryId': '24'}
+
+    def fetched(self, snippet=None, publish_at='2023-10-17T05:00:00Z'):
+        return ymu.video_record({'id': '1', 'snippet': dict(self.snippet, **(snippet or {})),
+                                 'status': {'privacyStatus': 'private', 'publishAt': publish_at}})
+
+    def test_only_the_parts_that_change_are_sent(self):
+        def parts(video):
+            return ymu.video_update_parts(video, 'Prefix 1', self.publish_time, self.config, '24')
+
+        self.assertEqual(parts(ymu.VideoRecord('1', '1')), ("snippet", "status"))  # State not fetched
+        self.assertEqual(parts(self.fetched()), ())
+        self.assertEqual(parts(self.fetched(publish_at=None)), ("status",))
+        self.assertEqual(parts(self.fetched({'tags': ['other']})), ("snippet",))
+        self.assertEqual(parts(self.fetched({'description': 'Old'}, '2023-10-18T05:00:00Z')), ("snippet", "status"))
+        body = ymu.build_video_update_body('1', 'Prefix 1', self.publish_time, self.config, '24', parts=("status",))
+        self.assertEqual(set(body), {"id", "status"})
+
+    def test_unchanged_videos_are_skipped_but_still_added_to_the_playlist(self):
+        youtube = TestBatchRequests().make_youtube()
+        videos_to_update = [(self.fetched(), 'Prefix 1', self.publish_time),
+                            (self.fetched(publish_at=None), 'Prefix 1', self.publish_time)]
+        videos_to_update[1][0].id = '2'
+
+        self.assertEqual(ymu.diff_updates(videos_to_update, self.config, '24')[1], {"unchanged": 1, "partial": 1, "full": 0})
+        report = ymu.batch_update_videos(youtube, videos_to_update, self.config, '24')
+
+        self.assertEqual(report['1'], {"update": "unchanged", "playlist_insert": "ok", "error": None})
+        self.assertEqual(report['2'], {"update": "ok", "playlist_insert": "ok", "error": None})
+        update_batch, = youtube.batches
+        self.assertEqual(len(update_batch.requests), 1)
+        self.assertEqual(youtube.playlistItems().insert.call_count, 2)
+        youtube.videos().update.assert_called_once()
+        self.assertEqual(youtube.videos().update.call_args.kwargs["part"], "status")
+
+
+class TestSlotScheduling(unittest.TestCase):
+
+    def test_iterator_yields_the_table_and_respects_slots_taken_along_the_way(self):
+        start_date = datetime.datetime(2023, 10, 17)
+        table = ymu.build_slot_table(start_date, 20, [(1, 9), (13, 23)], 2, seed=3)
+        self.assertEqual(ymu.take_slots(ymu.iter_slots(start_date, [(1, 9), (13, 23)], 2, seed=3), 20), table)
+
+        taken = set()
+        slots = ymu.iter_slots(start_date, [(0, 23)], 1, taken=taken)
+        next(slots)
+        taken.update(datetime.datetime(2023, 10, 18, hour) for hour in range(23))
+        self.assertEqual(next(slots), datetime.datetime(2023, 10, 18, 23))
+
+    def test_any_number_of_videos_per_day_gets_distinct_slots(self):
+        start_date = datetime.datetime(2023, 10, 17)
+        table = ymu.build_slot_table(start_date, 1000, [(8, 11), (14, 17), (19, 22)], 5, seed=1, slot_minutes=15)
+
+        self.assertEqual(len(set(table)), 1000)
+        self.assertEqual(table, sorted(table))
+        self.assertEqual(table[-1].date(), datetime.date(2023, 10, 17) + datetime.timedelta(days=199))
+
+    def test_same_seed_gives_the_same_table(self):
+        start_date = datetime.datetime(2023, 10, 17)
+        first = ymu.build_slot_table(start_date, 50, [(1, 9), (13, 23)], 2, seed=42)
+        second = ymu.build_slot_table(start_date, 50, [(1, 9), (13, 23)], 2, seed=42)
+        self.assertEqual(first, second)
+
+    def test_one_slot_per_window(self):
+        table = ymu.build_slot_table(datetime.datetime(2023, 10, 17), 4, [(1, 9), (13, 23)], 2)
+        self.assertTrue(1 <= table[0].hour <= 9 and 13 <= table[1].hour <= 23)
+        self.assertEqual(table[2].date(), datetime.date(2023, 10, 18))
+
+    def test_blackout_dates_and_taken_slots_are_avoided(self):
+        taken = [datetime.datetime(2023, 10, 19, hour, tzinfo=datetime.timezone.utc) for hour in range(0, 23)]
+        table = ymu.build_slot_table(
+            datetime.datetime(2023, 10, 17), 3, [(0, 23)], 1,
+            blackout_dates={datetime.date(2023, 10, 18)}, taken=taken
+        )
+        self.assertEqual([slot.date() for slot in table],
+                         [datetime.date(2023, 10, 17), datetime.date(2023, 10, 19), datetime.date(2023, 10, 20)])
+        self.assertEqual(table[1].hour, 23)
+
+    def test_timezone_slots_are_aware(self):
+        table = ymu.build_slot_table(datetime.datetime(2023, 10, 17), 1, [(18, 18)], 1, timezone=ymu.ZoneInfo("Europe/Paris"))
+        self.assertEqual(table[0].isoformat(), "2023-10-17T18:00:00+02:00")
+
+    def test_local_times_skipped_by_spring_forward_are_never_used(self):
+        new_york = ymu.ZoneInfo("America/New_York")
+        table = ymu.build_slot_table(datetime.datetime(2024, 3, 10), 30, [(1, 9)], 30, timezone=new_york, slot_minutes=30)
+
+        self.assertEqual(len({slot.astimezone(datetime.timezone.utc) for slot in table}), 30)
+        self.assertNotIn(2, [slot.hour for slot in table if slot.date() == datetime.date(2024, 3, 10)])
+
+    def test_taken_slots_are_compared_as_instants_on_fall_back_night(self):
+        new_york = ymu.ZoneInfo("America/New_York")
+        # 1:00 EST, the second 1:00 of the night; the slot table offers the first one (EDT)
+        taken = [datetime.datetime(2024, 11, 3, 6, 0, tzinfo=datetime.timezone.utc)]
+        table = ymu.build_slot_table(datetime.datetime(2024, 11, 3), 1, [(1, 1)], 1, timezone=new_york, taken=taken, slot_minutes=30)
+
+        self.assertEqual(table[0].astimezone(datetime.timezone.utc), datetime.datetime(2024, 11, 3, 5, 0, tzinfo=datetime.timezone.utc))
+
+    def test_calculate_publish_time_supports_more_than_two_videos_per_day(self):
+        start_date = datetime.datetime(2023, 10, 17)
+        result = calculate_publish_time(start_date, 4, (1, 9), (13, 23), 3)
+        self.assertEqual(result.date(), datetime.date(2023, 10, 18))
 
 
 if __name__ == '__main__':
@@ -1,45 +1,105 @@
 import os
+import argparse
 import re
 import pickle
 import datetime
 import random
-from googleapiclient.discovery import build
+import json
+import hashlib
+import csv
+import string
+import sqlite3
+import time
+# googleapiclient.discovery, google_auth_oauthlib, google.auth transports, httplib2 and requests
+# take most of the startup time: they are imported where an API call first needs them
 from googleapiclient.errors import HttpError
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from dotenv import load_dotenv
+from dotenv import load_dotenv, dotenv_values
 from datetime import timedelta
+from zoneinfo import ZoneInfo
 import logging
-
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+import asyncio
+import threading
+import bisect
+import itertools
+import queue
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
 
 ONLY_NUMBERS_REGEX = r'^\d+$'
 CONTAINS_NUMBERS_REGEX = r'\d+'
 
-DEBUG_MODE = True  # Set this to False for INFO mode
+DEBUG_MODE = False  # Set this to True (or DEBUG_MODE=true in .env, or --debug) for DEBUG mode
+
+def configure_logging(debug=False):
+    """Log at INFO level, or DEBUG when asked to. Called from the command line, never at import time."""
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # ---------------- Configuration Loading ----------------
 
-def load_configurations():
+def load_configurations(env_file=None, overrides=None):
+    """Read the configuration from .env and the environment, or for a fleet channel from env_file then overrides, without touching os.environ."""
     load_dotenv()
+    values = dict(dotenv_values(env_file)) if env_file else {}
+    values.update({key: str(value) for key, value in (overrides or {}).items()})
+
+    def getenv(key, default=None):
+        value = values.get(key)
+        return value if value is not None else os.getenv(key, default)
+
     config = {
-        "TITLE_PREFIX": os.getenv('TITLE_PREFIX'),
-        "TITLE_SUFFIX": os.getenv('TITLE_SUFFIX'),
-        "PLAYLIST_ID": os.getenv('PLAYLIST_ID'),
-        "DESCRIPTION": os.getenv('DESCRIPTION').replace('\\n', '\n'),
-        "FIRST_INTERVAL": (int(os.getenv('FIRST_INTERVAL_START',1)), int(os.getenv('FIRST_INTERVAL_END',9))), # Par défaut ( 1,9 )
-        "SECOND_INTERVAL": (int(os.getenv('SECOND_INTERVAL_START',13)), int(os.getenv('SECOND_INTERVAL_END',23))), # Par défaut ( 13 , 23 )
-        "TEMP_DATE": os.getenv('TEMP_DATE',datetime.datetime.now().strftime('%Y-%m-%d')), 
-        "MAX_VIDEOS": int(os.getenv('MAX_VIDEOS', 400)),  # Par défaut à 400 si non défini
-        "REQ_MAX_RESULT": int(os.getenv('REQ_MAX_RESULT', 400)),  # Par défaut à 400 si non défini
-        "START_DATE": datetime.datetime.strptime(os.getenv('START_DATE', datetime.datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d'),
-        "START_VIDEO_NUMBER": int(os.getenv('START_VIDEO_NUMBER', 130)),  # Par défaut à 130 si non défini
-        "END_VIDEO_NUMBER": int(os.getenv('END_VIDEO_NUMBER', 200)),  # Par défaut à 200 si non défini
-        "VIDEOS_PER_DAY": int(os.getenv('VIDEOS_PER_DAY', 2)),  # Par défaut à 2 si non défini
-        "VIDEO_TAGS": os.getenv('VIDEO_TAGS').split(','),
+        "TITLE_PREFIX": getenv('TITLE_PREFIX'),
+        "TITLE_SUFFIX": getenv('TITLE_SUFFIX'),
+        "PLAYLIST_ID": getenv('PLAYLIST_ID'),
+        "DESCRIPTION": getenv('DESCRIPTION', '').replace('\\n', '\n'),
+        "FIRST_INTERVAL": (int(getenv('FIRST_INTERVAL_START',1)), int(getenv('FIRST_INTERVAL_END',9))), # Par défaut ( 1,9 )
+        "SECOND_INTERVAL": (int(getenv('SECOND_INTERVAL_START',13)), int(getenv('SECOND_INTERVAL_END',23))), # Par défaut ( 13 , 23 )
+        "TEMP_DATE": getenv('TEMP_DATE',datetime.datetime.now().strftime('%Y-%m-%d')), 
+        "MAX_VIDEOS": int(getenv('MAX_VIDEOS', 400)),  # Par défaut à 400 si non défini
+        "REQ_MAX_RESULT": int(getenv('REQ_MAX_RESULT', 400)),  # Par défaut à 400 si non défini
+        "START_DATE": datetime.datetime.strptime(getenv('START_DATE', datetime.datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d'),
+        "START_VIDEO_NUMBER": int(getenv('START_VIDEO_NUMBER', 130)),  # Par défaut à 130 si non défini
+        "END_VIDEO_NUMBER": int(getenv('END_VIDEO_NUMBER', 200)),  # Par défaut à 200 si non défini
+        "VIDEOS_PER_DAY": int(getenv('VIDEOS_PER_DAY', 2)),  # Par défaut à 2 si non défini
+        "PUBLISH_WINDOWS": parse_publish_windows(getenv('PUBLISH_WINDOWS')) if getenv('PUBLISH_WINDOWS') else None,  # Ex: "1-9,13-23", remplace FIRST/SECOND_INTERVAL
+        "TIMEZONE": getenv('TIMEZONE', ''),  # Fuseau horaire des créneaux, ex: Europe/Paris (vide = heures naïves comme avant)
+        "BLACKOUT_DATES": [datetime.datetime.strptime(value.strip(), '%Y-%m-%d').date() for value in getenv('BLACKOUT_DATES', '').split(',') if value.strip()],
+        "SCHEDULE_SEED": int(getenv('SCHEDULE_SEED')) if getenv('SCHEDULE_SEED') else None,  # Graine pour un planning reproductible
+        "SLOT_MINUTES": int(getenv('SLOT_MINUTES', 60)),  # Granularité des créneaux en minutes
+        "VIDEO_TAGS": getenv('VIDEO_TAGS').split(','),
+        "DISCOVERY_MODE": getenv('DISCOVERY_MODE', 'uploads'),  # 'uploads' (1 unité/page) ou 'search' (100 unités/page)
+        "VIDEO_CATEGORY": getenv('VIDEO_CATEGORY', 'Entertainment'),  # Nom ou ID de la catégorie
+        "REGION_CODE": getenv('REGION_CODE', 'US'),
+        "CATEGORY_CACHE_FILE": getenv('CATEGORY_CACHE_FILE', 'categories_cache.json'),  # Vide pour désactiver le cache disque
+        "CATEGORY_CACHE_TTL": int(getenv('CATEGORY_CACHE_TTL', 7 * 24 * 3600)),  # Durée de validité du cache en secondes
+        "JOURNAL_FILE": getenv('JOURNAL_FILE', 'run_journal.jsonl'),  # Journal de reprise, vide pour désactiver
+        "DAILY_QUOTA": int(getenv('DAILY_QUOTA', 10000)),  # Quota journalier du projet Google Cloud
+        "QUOTA_RESERVE": int(getenv('QUOTA_RESERVE', 0)),  # Unités à ne pas dépenser en mises à jour
+        "QUOTA_LEDGER_FILE": getenv('QUOTA_LEDGER_FILE', 'quota_ledger.json'),
+        "MAX_RETRIES": int(getenv('MAX_RETRIES', 5)),  # Nouvelles tentatives sur erreurs temporaires
+        "RATE_LIMIT": float(getenv('RATE_LIMIT', 50)),  # Requêtes par seconde
+        "CONCURRENCY": int(getenv('CONCURRENCY', 1)),  # Nombre de workers en parallèle, 1 = séquentiel
+        "INVENTORY_DB": getenv('INVENTORY_DB', ''),  # Inventaire local SQLite synchronisé par ETag (parcourt toujours les uploads), vide pour désactiver
+        "USE_BATCH": getenv('USE_BATCH', 'true').lower() == 'true',  # Envoie les mises à jour par requêtes batch
+        "STREAMING": getenv('STREAMING', 'false').lower() == 'true',  # Met à jour les brouillons par paquets : limite la mémoire, pas le délai avant la première mise à jour
+        "PLAYLIST_POSITION": getenv('PLAYLIST_POSITION', 'start'),  # 'start' (position 0) ou 'end' (ajout en fin, dans l'ordre du planning)
+        "METRICS_FILE": getenv('METRICS_FILE', ''),  # Export des métriques en fin de run : JSON, ou Prometheus pour un fichier .prom
+        "ASYNC_BACKEND": getenv('ASYNC_BACKEND', 'false').lower() == 'true',  # Appels individuels en parallèle sur une session HTTP keep-alive, au lieu des batchs
+        "MAX_IN_FLIGHT": int(getenv('MAX_IN_FLIGHT', 8)),  # Requêtes simultanées maximum avec ASYNC_BACKEND
+        "TITLE_TEMPLATE": getenv('TITLE_TEMPLATE', ''),  # Ex: "{prefix}{number} - {guest}{suffix}", vide = TITLE_PREFIX + titre + TITLE_SUFFIX
+        "DESCRIPTION_TEMPLATE": getenv('DESCRIPTION_TEMPLATE', '').replace('\\n', '\n'),  # Vide = DESCRIPTION pour toutes les vidéos
+        "TAGS_TEMPLATE": getenv('TAGS_TEMPLATE', ''),  # Tags séparés par des virgules, vide = VIDEO_TAGS
+        "METADATA_FILE": getenv('METADATA_FILE', ''),  # CSV ou JSON de métadonnées par numéro de vidéo, colonnes utilisables dans les modèles
 
     }
 
+    try:
+        config["METADATA"] = load_metadata_file(config["METADATA_FILE"])
+    except (OSError, ValueError, KeyError) as e:
+        logging.error(f"METADATA_FILE illisible : {e!r}")
+        exit(1)
+
     if not validate_configurations(config):
         exit(1)  # Quitter le script si les configurations ne sont pas valides
 
@@ -63,105 +123,829 @@ def validate_configurations(config):
         return False
 
     # Vérification de DESCRIPTION
-    if not config["DESCRIPTION"]:
+    if not config["DESCRIPTION"] and not config.get("DESCRIPTION_TEMPLATE"):
         logging.error("DESCRIPTION est manquant ou vide dans .env.")
         return False
+    for reason in (description_skip_reason(config["DESCRIPTION"]) if config["DESCRIPTION"] else None,
+                   tags_skip_reason(config["VIDEO_TAGS"]) if config.get("VIDEO_TAGS") else None):
+        if reason:
+            logging.error(f"DESCRIPTION ou VIDEO_TAGS invalide : {reason}.")
+            return False
+
+    # Vérification des modèles de métadonnées
+    try:
+        compile_metadata_templates(config)
+    except ValueError as e:
+        logging.error(f"Modèle de métadonnées invalide : {e}")
+        return False
+
+    # Vérification des créneaux de publication
+    for start_hour, end_hour in config.get("PUBLISH_WINDOWS") or []:
+        if not 0 <= start_hour <= end_hour <= 23:
+            logging.error(f"PUBLISH_WINDOWS contient un créneau invalide : {start_hour}-{end_hour}.")
+            return False
+    if config.get("VIDEOS_PER_DAY", 1) < 1:
+        logging.error("VIDEOS_PER_DAY doit être supérieur ou égal à 1.")
+        return False
 
 
     return True
 
 # ---------------- OAuth Authentication ----------------
 
-def authenticate_with_oauth():
+SCOPES = ['https://www.googleapis.com/auth/youtube.force-ssl']
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)  # Refresh the access token when it expires within this margin
+
+def token_json_file(token_file):
+    """The JSON token file for token_file: a .pickle token of an older version is kept next to it as .json."""
+    root, extension = os.path.splitext(token_file)
+    return root + '.json' if extension == '.pickle' else token_file
+
+def save_credentials(creds, token_file):
+    """Write creds to token_file as JSON, readable by the owner only."""
+    tmp_file = token_file + '.tmp'
+    with os.fdopen(os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as token:
+        token.write(creds.to_json())
+    os.replace(tmp_file, token_file)
+
+def needs_refresh(creds):
+    """True if the access token is invalid or expires within TOKEN_REFRESH_MARGIN."""
+    if not creds.expiry:
+        return not creds.valid
+    # google-auth keeps expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return creds.expiry - now < TOKEN_REFRESH_MARGIN
+
+def load_credentials(token_file='token.json', client_secrets_file='credentials.json', interactive=True):
+    """Load the saved OAuth credentials, refreshing them ahead of expiry, or run the OAuth flow.
+    Unattended runs (interactive False) raise RuntimeError instead of opening the browser."""
+    token_file = token_json_file(token_file)
+    legacy_token_file = os.path.splitext(token_file)[0] + '.pickle'
     creds = None
-    if os.path.exists('token.pickle'):
-        with open('token.pickle', 'rb') as token:
+    if os.path.exists(token_file):
+        from google.oauth2.credentials import Credentials
+        creds = Credentials.from_authorized_user_file(token_file, SCOPES)
+        logging.info(f"Loaded credentials from {token_file}.")
+    elif os.path.exists(legacy_token_file):
+        with open(legacy_token_file, 'rb') as token:
             creds = pickle.load(token)
-            logging.info("Loaded credentials from token.pickle.")
-    
+        save_credentials(creds, token_file)
+        logging.info(f"Converted {legacy_token_file} to {token_file}. {legacy_token_file} is no longer read and can be deleted.")
+
+    if creds and creds.refresh_token and needs_refresh(creds):
+        from google.auth.transport.requests import Request
+        logging.info("Refreshing credentials before they expire.")
+        creds.refresh(Request())
+        save_credentials(creds, token_file)
+
     if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            logging.info("Refreshing expired credentials.")
-            creds.refresh(Request())
-        else:
-            logging.info("No valid credentials found. Starting OAuth2 flow.")
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', ['https://www.googleapis.com/auth/youtube.force-ssl'])
-            creds = flow.run_local_server(port=0)
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(creds, token)
-            logging.info("Credentials obtained and saved to token.pickle.")
+        if not interactive:
+            raise RuntimeError(f"No valid credentials in {token_file}. Authorize this account first.")
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        logging.info("No valid credentials found. Starting OAuth2 flow.")
+        flow = InstalledAppFlow.from_client_secrets_file(client_secrets_file, SCOPES)
+        creds = flow.run_local_server(port=0)
+        save_credentials(creds, token_file)
+        logging.info(f"Credentials obtained and saved to {token_file}.")
     
-    return build('youtube', 'v3', credentials=creds)
+    return creds
+
+DISCOVERY_DOCUMENTS = {}  # (service, version) -> discovery document, read once per process
+
+def build(serviceName, version, **kwargs):
+    """googleapiclient.discovery.build, imported on first use, from the bundled discovery document read once per process."""
+    from googleapiclient.discovery import build as build_service, build_from_document
+    from googleapiclient.discovery_cache import get_static_doc
+    key = (serviceName, version)
+    if key not in DISCOVERY_DOCUMENTS:
+        DISCOVERY_DOCUMENTS[key] = get_static_doc(serviceName, version)
+    if DISCOVERY_DOCUMENTS[key] is None:
+        return build_service(serviceName, version, **kwargs)
+    return build_from_document(DISCOVERY_DOCUMENTS[key], **kwargs)
+
+API_RESOURCES = weakref.WeakKeyDictionary()  # client -> {resource name: resource object}
+API_RESOURCES_LOCK = threading.Lock()
+
+def api_resource(youtube, name):
+    """Return youtube.<name>(), built once per client: building a resource parses its whole discovery schema."""
+    with API_RESOURCES_LOCK:
+        resources = API_RESOURCES.setdefault(youtube, {})
+        if name not in resources:
+            resources[name] = getattr(youtube, name)()
+        return resources[name]
+
+def authenticate_with_oauth():
+    return build('youtube', 'v3', credentials=load_credentials())
+
+# ---------------- Quota Ledger ----------------
+
+# Quota units charged by the YouTube Data API v3 for each method used by this script
+QUOTA_COSTS = {
+    "search.list": 100,
+    "channels.list": 1,
+    "videos.list": 1,
+    "videos.update": 50,
+    "playlistItems.list": 1,
+    "playlistItems.insert": 50,
+    "videoCategories.list": 1,
+}
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")  # Quotas reset at midnight Pacific time
+QUOTA_ERROR_REASONS = ("quotaExceeded", "dailyLimitExceeded")
+
+QUOTA_LEDGER = {"day": None, "used": 0, "calls": {}, "daily_quota": 10000, "file": None, "dirty": False}
+QUOTA_LOCK = threading.Lock()
+QUOTA_FILE_LOCK = threading.Lock()  # Serializes ledger writes, so QUOTA_LOCK is never held during file I/O
+
+def quota_day(now=None):
+    """Return the current quota day (Pacific time) as 'YYYY-MM-DD'."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return now.astimezone(QUOTA_TIMEZONE).strftime('%Y-%m-%d')
+
+def load_quota_ledger(ledger_file=None, daily_quota=10000):
+    """Reset the ledger for today, picking up the usage already recorded in ledger_file."""
+    with QUOTA_LOCK:
+        QUOTA_LEDGER.update({"day": quota_day(), "used": 0, "calls": {}, "daily_quota": daily_quota, "file": ledger_file, "dirty": False})
+        if ledger_file and os.path.exists(ledger_file):
+            try:
+                with open(ledger_file, 'r') as f:
+                    saved = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable quota ledger {ledger_file}: {e}")
+                saved = {}
+            if saved.get("day") == QUOTA_LEDGER["day"]:
+                QUOTA_LEDGER["used"] = saved["used"]
+                QUOTA_LEDGER["calls"] = saved["calls"]
+    logging.info(f"Quota ledger for {QUOTA_LEDGER['day']}: {QUOTA_LEDGER['used']}/{daily_quota} units already used.")
+
+def save_quota_ledger():
+    """Write the charges made since the last save to the ledger file, aside then renamed so a killed run never truncates it."""
+    with QUOTA_FILE_LOCK:
+        with QUOTA_LOCK:
+            if not QUOTA_LEDGER["file"] or not QUOTA_LEDGER["dirty"]:
+                return
+            ledger_file = QUOTA_LEDGER["file"]
+            content = json.dumps({key: QUOTA_LEDGER[key] for key in ("day", "used", "calls")})
+            QUOTA_LEDGER["dirty"] = False
+        temp_file = ledger_file + '.tmp'
+        with open(temp_file, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, ledger_file)
+
+def charge_quota(method, calls=1):
+    """Record calls to an API method before sending, since failed calls cost quota too. Saved by the next save_quota_ledger."""
+    with QUOTA_LOCK:
+        day = quota_day()
+        if QUOTA_LEDGER["day"] != day:
+            # Crossed midnight Pacific time during the run
+            QUOTA_LEDGER.update({"day": day, "used": 0, "calls": {}})
+        QUOTA_LEDGER["used"] += QUOTA_COSTS[method] * calls
+        QUOTA_LEDGER["calls"][method] = QUOTA_LEDGER["calls"].get(method, 0) + calls
+        QUOTA_LEDGER["dirty"] = True
+
+def remaining_quota():
+    with QUOTA_LOCK:
+        if QUOTA_LEDGER["day"] != quota_day():
+            return QUOTA_LEDGER["daily_quota"]
+        return QUOTA_LEDGER["daily_quota"] - QUOTA_LEDGER["used"]
+
+def get_error_reason(error):
+    """Return the reason of an HttpError ('quotaExceeded', 'backendError'...), or None."""
+    details = getattr(error, 'error_details', None)
+    if isinstance(details, list) and details and isinstance(details[0], dict):
+        return details[0].get('reason')
+    return None
+
+def is_quota_exceeded(error):
+    return isinstance(error, HttpError) and get_error_reason(error) in QUOTA_ERROR_REASONS
+
+def is_not_modified(error):
+    return isinstance(error, HttpError) and error.resp.status == 304
+
+# ---------------- Run Metrics ----------------
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Upper bounds in seconds, plus +Inf
+
+METRICS = {}
+METRICS_LOCK = threading.Lock()
+
+def method_metrics(method):
+    """Return the metrics of method, creating them if needed. The caller holds METRICS_LOCK."""
+    if method not in METRICS:
+        METRICS[method] = {
+            "calls": 0, "http_requests": 0, "errors": 0, "retries": 0, "quota": 0, "bytes": 0,
+            "latency_sum": 0.0, "latency_max": 0.0, "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+        }
+    return METRICS[method]
+
+def reset_metrics():
+    with METRICS_LOCK:
+        METRICS.clear()
+
+def record_api_call(method, seconds, calls=1, errors=0):
+    """Record one HTTP request carrying calls API calls to method, errors of which failed."""
+    with METRICS_LOCK:
+        entry = method_metrics(method)
+        entry["http_requests"] += 1
+        entry["calls"] += calls
+        entry["errors"] += errors
+        entry["quota"] += QUOTA_COSTS.get(method, 0) * calls
+        entry["latency_sum"] += seconds
+        entry["latency_max"] = max(entry["latency_max"], seconds)
+        entry["latency_buckets"][bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+def record_retries(method, retries=1):
+    with METRICS_LOCK:
+        method_metrics(method)["retries"] += retries
+
+def record_response_bytes(method, size):
+    with METRICS_LOCK:
+        method_metrics(method)["bytes"] += size
+
+def measure_response_size(request, method):
+    """Wrap the postproc hook of a request to record the size of its raw response body, sent alone or in a batch."""
+    postproc = getattr(request, 'postproc', None)
+    if not callable(postproc):
+        return
+
+    def measured_postproc(resp, content):
+        record_response_bytes(method, len(content or b''))
+        return postproc(resp, content)
+
+    request.postproc = measured_postproc
+
+def latency_quantile(entry, quantile):
+    """Estimate a latency quantile as the upper bound of the histogram bucket it falls in."""
+    target = quantile * sum(entry["latency_buckets"])
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS + (entry["latency_max"],), entry["latency_buckets"]):
+        seen += count
+        if count and seen >= target:
+            return min(bound, entry["latency_max"])
+    return 0.0
+
+def format_metrics_table():
+    columns = ["method", "calls", "http", "errors", "retries", "quota", "KiB", "avg ms", "p95 ms", "max ms", "total s"]
+    lines = [f"{columns[0]:<22}" + "".join(f"{column:>9}" for column in columns[1:])]
+    with METRICS_LOCK:
+        for method, entry in sorted(METRICS.items()):
+            average = entry["latency_sum"] / entry["http_requests"] if entry["http_requests"] else 0.0
+            values = [
+                entry["calls"], entry["http_requests"], entry["errors"], entry["retries"], entry["quota"],
+                f"{entry['bytes'] / 1024:.1f}", f"{average * 1000:.0f}", f"{latency_quantile(entry, 0.95) * 1000:.0f}",
+                f"{entry['latency_max'] * 1000:.0f}", f"{entry['latency_sum']:.2f}",
+            ]
+            lines.append(f"{method:<22}" + "".join(f"{value:>9}" for value in values))
+    return "\n".join(lines)
+
+def format_prometheus_metrics():
+    """Render METRICS in the Prometheus text exposition format, for the node_exporter textfile collector."""
+    counters = [
+        ("calls", "youtube_api_calls_total", "API calls sent, by method."),
+        ("errors", "youtube_api_errors_total", "API calls that failed, by method."),
+        ("retries", "youtube_api_retries_total", "API calls sent again after a transient error, by method."),
+        ("quota", "youtube_api_quota_units_total", "Quota units charged, by method."),
+        ("bytes", "youtube_api_response_bytes_total", "Bytes of response bodies received, by method."),
+    ]
+    with METRICS_LOCK:
+        methods = sorted(METRICS.items())
+        lines = []
+        for key, name, description in counters:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{method="{method}"}} {entry[key]}' for method, entry in methods]
+
+        name = "youtube_api_request_duration_seconds"
+        lines += [f"# HELP {name} Latency of HTTP requests (a whole batch counts once), by method.", f"# TYPE {name} histogram"]
+        for method, entry in methods:
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"], entry["latency_buckets"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{method="{method}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{method="{method}"}} {entry["latency_sum"]:.6f}')
+            lines.append(f'{name}_count{{method="{method}"}} {entry["http_requests"]}')
+    return "\n".join(lines) + "\n"
+
+def write_metrics(metrics_file):
+    """Write METRICS to metrics_file: Prometheus text for a .prom file, JSON otherwise."""
+    if metrics_file.endswith('.prom'):
+        content = format_prometheus_metrics()
+    else:
+        with METRICS_LOCK:
+            content = json.dumps({
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "latency_buckets": list(LATENCY_BUCKETS),
+                "methods": METRICS,
+            }, indent=2)
+    # Written aside then renamed, so a collector never reads a half-written file
+    temp_file = metrics_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        f.write(content)
+    os.replace(temp_file, metrics_file)
+
+def report_run_metrics(metrics_file=None):
+    logging.info("API calls of this run:\n" + format_metrics_table())
+    if metrics_file:
+        write_metrics(metrics_file)
+        logging.info(f"Run metrics written to {metrics_file}.")
+
+# ---------------- Request Executor ----------------
+
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+RETRIABLE_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "backendError", "internalError")
+def retriable_exceptions():
+    """Network errors worth retrying. A function, so httplib2 and requests are only imported once an error needs checking."""
+    import httplib2
+    import requests
+    return (ConnectionError, TimeoutError, httplib2.HttpLib2Error, requests.ConnectionError, requests.Timeout)
+
+REQUEST_SETTINGS = {"max_retries": 5, "base_delay": 1.0, "max_delay": 64.0}
+RATE_LIMITER = {"rate": 50.0, "capacity": 50.0, "tokens": 50.0, "updated": time.monotonic()}
+RATE_LIMIT_LOCK = threading.Lock()
+
+def configure_request_executor(max_retries=5, rate_limit=50.0, burst=None, base_delay=1.0, max_delay=64.0):
+    """Set the retry policy and the token bucket (rate_limit requests per second, burst at most)."""
+    REQUEST_SETTINGS.update({"max_retries": max_retries, "base_delay": base_delay, "max_delay": max_delay})
+    capacity = float(burst or rate_limit)
+    with RATE_LIMIT_LOCK:
+        RATE_LIMITER.update({"rate": float(rate_limit), "capacity": capacity, "tokens": capacity, "updated": time.monotonic()})
+
+def acquire_rate_limit(tokens=1):
+    """Take tokens from the bucket, sleeping for as long as the bucket is in debt."""
+    with RATE_LIMIT_LOCK:
+        now = time.monotonic()
+        RATE_LIMITER["tokens"] = min(
+            RATE_LIMITER["capacity"],
+            RATE_LIMITER["tokens"] + (now - RATE_LIMITER["updated"]) * RATE_LIMITER["rate"]
+        )
+        RATE_LIMITER["updated"] = now
+        # Reserve the tokens right away so concurrent callers queue up behind this one
+        RATE_LIMITER["tokens"] -= tokens
+        wait = -RATE_LIMITER["tokens"] / RATE_LIMITER["rate"] if RATE_LIMITER["tokens"] < 0 else 0
+    if wait:
+        time.sleep(wait)
+
+def is_retriable(error):
+    if error is None:
+        return False
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRIABLE_STATUS_CODES or get_error_reason(error) in RETRIABLE_REASONS
+    return isinstance(error, retriable_exceptions())
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: a random delay up to base_delay * 2^attempt."""
+    return random.uniform(0, min(REQUEST_SETTINGS["max_delay"], REQUEST_SETTINGS["base_delay"] * 2 ** attempt))
+
+def execute_request(request, method):
+    """Execute an API request through the rate limiter, charging its quota and retrying transient errors."""
+    measure_response_size(request, method)
+    attempt = 0
+    try:
+        while True:
+            acquire_rate_limit()
+            charge_quota(method)
+            start = time.perf_counter()
+            try:
+                response = request.execute()
+                record_api_call(method, time.perf_counter() - start)
+                return response
+            except retriable_exceptions() + (HttpError,) as e:
+                record_api_call(method, time.perf_counter() - start, errors=0 if is_not_modified(e) else 1)
+                if attempt >= REQUEST_SETTINGS["max_retries"] or not is_retriable(e):
+                    raise
+                record_retries(method)
+                delay = backoff_delay(attempt)
+                logging.warning(f"{method} failed with {e}. Retrying in {delay:.1f}s (attempt {attempt + 1}).")
+                time.sleep(delay)
+                attempt += 1
+    finally:
+        # Once per request, retries included
+        save_quota_ledger()
+
+# ---------------- Video Records ----------------
+
+# Partial responses: ask the API only for the fields the updater reads
+VIDEO_FIELDS = "etag,items(id,snippet(title,description,tags,categoryId),status(privacyStatus,publishAt))"
+SEARCH_FIELDS = "nextPageToken,items(id/videoId,snippet/title)"
+STATUS_FIELDS = "items(id,status(privacyStatus,publishAt))"  # Enough to tell drafts from scheduled videos
+PLAYLIST_ITEM_FIELDS = {
+    "snippet": "etag,nextPageToken,items(snippet(title,resourceId/videoId))",
+    "contentDetails": "etag,nextPageToken,items(contentDetails/videoId)",
+}
+
+@dataclass(slots=True)
+class VideoRecord:
+    """The fields of a video the updater uses, in place of the full videos().list resource.
+    snippet_digest stands for the fetched snippet; metadata holds what render_metadata rendered for the video."""
+    id: str
+    title: str
+    number: Optional[int] = None
+    privacy_status: Optional[str] = 'private'
+    publish_at: Optional[str] = None
+    category_id: Optional[str] = None
+    snippet_digest: Optional[str] = None
+    metadata: Optional[dict] = None
+
+    @property
+    def is_draft(self):
+        return self.privacy_status == 'private' and not self.publish_at
+
+    @property
+    def is_scheduled(self):
+        return bool(self.publish_at)
+
+def snippet_digest(title, description, tags, category_id):
+    """A short digest of the snippet fields the updater writes, stable across runs for the inventory."""
+    snippet = json.dumps([title, description, list(tags or []), category_id], ensure_ascii=False)
+    return hashlib.blake2b(snippet.encode('utf-8'), digest_size=8).hexdigest()
+
+def video_record(video, regex_pattern=CONTAINS_NUMBERS_REGEX):
+    """Build a VideoRecord from a videos().list item."""
+    snippet = video.get('snippet', {})
+    status = video.get('status', {})
+    return VideoRecord(
+        video['id'],
+        snippet.get('title', ''),
+        extract_video_number(snippet.get('title', ''), regex_pattern),
+        status.get('privacyStatus'),
+        status.get('publishAt'),
+        snippet.get('categoryId'),
+        # The API leaves tags out when there are none, but always returns the description it was asked for
+        snippet_digest(snippet.get('title', ''), snippet['description'], snippet.get('tags'), snippet.get('categoryId')) if 'description' in snippet else None
+    )
 
 # ---------------- YouTube API Interactions ----------------
 
 
-def get_all_draft_videos(youtube, start_video_number=1, end_video_number=300, max_results=400, regex_pattern=CONTAINS_NUMBERS_REGEX):
-    relevant_video_ids = []
-    draft_videos = []
-    scheduled_videos = []
+MAX_PAGE_SIZE = 50  # The API never returns more than 50 items per page
+SEARCH_PAGE_COST = QUOTA_COSTS["search.list"]
+LIST_PAGE_COST = QUOTA_COSTS["playlistItems.list"]
+
+def is_relevant_title(title, start_video_number, end_video_number, regex_pattern):
+    match = re.search(regex_pattern, title)
+    if match:
+        number = int(match.group())
+        return start_video_number <= number < end_video_number
+    return False
 
+def iter_search_pages(youtube, max_results):
+    """Yield the search().list(forMine=True) response pages of the channel's videos."""
     next_page_token = None
+    while True:
+        search_response = execute_request(youtube.search().list(
+            part="snippet",
+            type="video",
+            forMine=True,
+            maxResults=min(max_results, MAX_PAGE_SIZE),
+            pageToken=next_page_token,
+            fields=SEARCH_FIELDS
+        ), "search.list")
+        yield search_response
+        next_page_token = search_response.get('nextPageToken')
+        if not next_page_token:
+            return
 
-    # first retrieved suitable IDs
+def iter_playlist_pages(youtube, playlist_id, part="snippet"):
+    """Yield the playlistItems().list response pages of a playlist."""
+    next_page_token = None
     while True:
-        try:
-            search_response = youtube.search().list(
-                part="snippet",
-                type="video",
-                forMine=True,
-                maxResults=max_results,
-                pageToken=next_page_token
-            ).execute()
-        except HttpError as e:
-            logging.error(f"Error fetching videos: {e}")
-            break
+        playlist_response = execute_request(api_resource(youtube, "playlistItems").list(
+            part=part,
+            playlistId=playlist_id,
+            maxResults=MAX_PAGE_SIZE,
+            pageToken=next_page_token,
+            fields=PLAYLIST_ITEM_FIELDS.get(part)
+        ), "playlistItems.list")
+        yield playlist_response
+        next_page_token = playlist_response.get('nextPageToken')
+        if not next_page_token:
+            return
 
-        video_items = search_response.get('items', [])
+def search_relevant_video_ids(youtube, start_video_number, end_video_number, max_results, regex_pattern):
+    """Collect relevant video IDs with search().list(forMine=True). Returns (video_ids, pages)."""
+    relevant_video_ids = []
+    pages = 0
 
-        for video in video_items:
-            title = video['snippet']['title']
-            match = re.search(regex_pattern, title)
-            if match:
-                number = int(match.group())
-                if start_video_number <= number < end_video_number:
+    try:
+        for search_response in iter_search_pages(youtube, max_results):
+            pages += 1
+            for video in search_response.get('items', []):
+                if is_relevant_title(video['snippet']['title'], start_video_number, end_video_number, regex_pattern):
                     relevant_video_ids.append(video['id']['videoId'])
+    except HttpError as e:
+        logging.error(f"Error fetching videos: {e}")
 
-        next_page_token = search_response.get('nextPageToken')
-        if not next_page_token:
-            break
+    return relevant_video_ids, pages
 
-    # Fetch detailed information for relevant videos in batches of 50
-    BATCH_SIZE = 50
-    for i in range(0, len(relevant_video_ids), BATCH_SIZE):
-        batch_ids = relevant_video_ids[i:i+BATCH_SIZE]
+def get_uploads_playlist_id(youtube):
+    channels_response = execute_request(youtube.channels().list(part="contentDetails", mine=True), "channels.list")
+    items = channels_response.get('items', [])
+    if not items:
+        return None
+    return items[0]['contentDetails']['relatedPlaylists']['uploads']
+
+def list_uploads_relevant_video_ids(youtube, start_video_number, end_video_number, regex_pattern):
+    """Collect relevant video IDs from the uploads playlist. Returns (video_ids, pages, total_items), or None to fall back to search."""
+    try:
+        uploads_playlist_id = get_uploads_playlist_id(youtube)
+    except HttpError as e:
+        logging.error(f"Error fetching the uploads playlist: {e}")
+        return None
+    if not uploads_playlist_id:
+        logging.warning("No uploads playlist found for this channel.")
+        return None
+
+    relevant_video_ids = []
+    pages = 1  # channels().list
+    total_items = 0
+
+    try:
+        for playlist_response in iter_playlist_pages(youtube, uploads_playlist_id):
+            pages += 1
+            video_items = playlist_response.get('items', [])
+            total_items += len(video_items)
+            for item in video_items:
+                if is_relevant_title(item['snippet']['title'], start_video_number, end_video_number, regex_pattern):
+                    relevant_video_ids.append(item['snippet']['resourceId']['videoId'])
+    except HttpError as e:
+        logging.error(f"Error fetching uploads playlist page: {e}")
+        return None
+
+    return relevant_video_ids, pages, total_items
+
+def get_all_draft_videos(youtube, start_video_number=1, end_video_number=300, max_results=400, regex_pattern=CONTAINS_NUMBERS_REGEX, discovery_mode="search", max_in_flight=1):
+    """Synchronous wrapper of get_all_draft_videos_async. max_in_flight > 1 needs a client from build_pooled_client."""
+    return run_async(get_all_draft_videos_async(
+        youtube, start_video_number, end_video_number, max_results, regex_pattern, discovery_mode, max_in_flight
+    ), max_in_flight)
+
+async def get_all_draft_videos_async(youtube, start_video_number=1, end_video_number=300, max_results=400, regex_pattern=CONTAINS_NUMBERS_REGEX, discovery_mode="search", max_in_flight=1):
+    """Return (draft_videos, scheduled_videos) of the number range, as VideoRecords sorted by number.
+    Pages are walked one at a time; the 50-ID detail chunks are fetched max_in_flight at a time."""
+    draft_videos = []
+    scheduled_videos = []
+
+    # first retrieved suitable IDs
+    uploads_result = None
+    if discovery_mode == "uploads":
+        uploads_result = await asyncio.to_thread(list_uploads_relevant_video_ids, youtube, start_video_number, end_video_number, regex_pattern)
+        if uploads_result is None:
+            logging.warning("Uploads playlist walk failed. Falling back to search discovery.")
+
+    if uploads_result is not None:
+        relevant_video_ids, pages, total_items = uploads_result
+        quota_used = pages * LIST_PAGE_COST
+        # A search over the same inventory would have needed one 100-unit page per 50 videos
+        search_quota = max(1, -(-total_items // MAX_PAGE_SIZE)) * SEARCH_PAGE_COST
+        logging.info(f"Uploads discovery: {pages} pages, {quota_used} quota units used, ~{search_quota - quota_used} units saved over search.")
+    else:
+        relevant_video_ids, pages = await asyncio.to_thread(search_relevant_video_ids, youtube, start_video_number, end_video_number, max_results, regex_pattern)
+        logging.info(f"Search discovery: {pages} pages, {pages * SEARCH_PAGE_COST} quota units used.")
+
+    limit = asyncio.Semaphore(max_in_flight)
+    videos_resource = youtube.videos()
+
+    async def fetch(i):
         try:
-            videos_response = youtube.videos().list(
+            videos_response = await execute_request_async(videos_resource.list(
                 part="snippet,status",
-                id=",".join(batch_ids)
-            ).execute()
-
-            for video in videos_response.get('items', []):
-                if video['status']['privacyStatus'] == 'private' and 'publishAt' not in video['status']:
-                    draft_videos.append(video)
-                    logging.debug(f"Video '{video['snippet']['title']}' is a draft. Adding to draft_videos.")
-                elif 'publishAt' in video['status']:
-                    scheduled_videos.append(video)
-                    logging.debug(f"Video '{video['snippet']['title']}' has a scheduled publish date. Adding to scheduled_videos.")
+                id=",".join(relevant_video_ids[i:i+MAX_PAGE_SIZE]),
+                fields=VIDEO_FIELDS
+            ), "videos.list", limit)
         except HttpError as e:
             logging.error(f"Error fetching detailed video information for batch starting with {i}: {e}")
+            return []
+        return [video_record(item, regex_pattern) for item in videos_response.get('items', [])]
+
+    # Fetch detailed information for relevant videos in batches of 50
+    chunks = await asyncio.gather(*(fetch(i) for i in range(0, len(relevant_video_ids), MAX_PAGE_SIZE)))
+    for video in itertools.chain.from_iterable(chunks):
+        if video.is_draft:
+            draft_videos.append(video)
+            logging.debug("Video '%s' is a draft. Adding to draft_videos.", video.title)
+        elif video.is_scheduled:
+            scheduled_videos.append(video)
+            logging.debug("Video '%s' has a scheduled publish date. Adding to scheduled_videos.", video.title)
 
     # Sort draft_videos based on numbers extracted from titles
-    draft_videos.sort(key=lambda video: int(re.search(regex_pattern, video['snippet']['title']).group()))
+    draft_videos.sort(key=lambda video: video.number)
     logging.debug("Draft list sorted.")
 
     # Sort scheduled_videos based on numbers extracted from titles
-    scheduled_videos.sort(key=lambda video: int(re.search(regex_pattern, video['snippet']['title']).group()))
+    scheduled_videos.sort(key=lambda video: video.number)
     logging.debug("Scheduled Video list sorted.")
 
     return draft_videos, scheduled_videos
 
 
+# ---------------- Channel Inventory ----------------
+
+INVENTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    number INTEGER,
+    privacy_status TEXT,
+    publish_at TEXT,
+    snippet_digest TEXT
+);
+CREATE INDEX IF NOT EXISTS videos_number ON videos (number);
+CREATE TABLE IF NOT EXISTS list_pages (
+    playlist_id TEXT NOT NULL,
+    page_token TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    next_page_token TEXT,
+    items TEXT NOT NULL,
+    PRIMARY KEY (playlist_id, page_token)
+);
+CREATE TABLE IF NOT EXISTS detail_ranges (
+    first_number INTEGER NOT NULL,
+    part INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    PRIMARY KEY (first_number, part)
+);
+"""
+
+def open_inventory(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.executescript(INVENTORY_SCHEMA)
+    # Inventory of an older version, whose detail chunks were keyed by their comma-joined IDs
+    connection.execute("DROP TABLE IF EXISTS detail_chunks")
+    if "snippet_digest" not in {column[1] for column in connection.execute("PRAGMA table_info(videos)")}:
+        # Inventory of an older version: fetch every detail chunk again to fill the new column
+        connection.execute("ALTER TABLE videos ADD COLUMN snippet_digest TEXT")
+        connection.execute("DELETE FROM detail_ranges")
+    connection.commit()
+    return connection
+
+def extract_video_number(title, regex_pattern=CONTAINS_NUMBERS_REGEX):
+    match = re.search(regex_pattern, title)
+    return int(match.group()) if match else None
+
+def execute_conditional_request(request, method, etag):
+    """Execute request with If-None-Match: etag. Returns None if the resource has not changed (304)."""
+    if etag:
+        request.headers['If-None-Match'] = etag
+    try:
+        return execute_request(request, method)
+    except HttpError as e:
+        if is_not_modified(e):
+            return None
+        raise
+
+def sync_inventory_pages(youtube, connection, uploads_playlist_id, regex_pattern):
+    """Walk the uploads playlist, reusing the stored pages that did not change. Returns the video IDs in it, or None on failure."""
+    video_ids = set()
+    page_token = ''
+    fetched = reused = 0
+
+    while True:
+        stored = connection.execute(
+            "SELECT etag, next_page_token, items FROM list_pages WHERE playlist_id = ? AND page_token = ?",
+            (uploads_playlist_id, page_token)
+        ).fetchone()
+        try:
+            response = execute_conditional_request(youtube.playlistItems().list(
+                part="snippet",
+                playlistId=uploads_playlist_id,
+                maxResults=MAX_PAGE_SIZE,
+                pageToken=page_token or None,
+                fields=PLAYLIST_ITEM_FIELDS["snippet"]
+            ), "playlistItems.list", stored[0] if stored else None)
+        except HttpError as e:
+            logging.error(f"Error syncing uploads playlist page: {e}")
+            return None
+
+        if response is None:
+            reused += 1
+            next_page_token = stored[1]
+            items = json.loads(stored[2])
+        else:
+            fetched += 1
+            next_page_token = response.get('nextPageToken')
+            items = [
+                [item['snippet']['resourceId']['videoId'], item['snippet']['title']]
+                for item in response.get('items', [])
+            ]
+            connection.execute(
+                "INSERT OR REPLACE INTO list_pages VALUES (?, ?, ?, ?, ?)",
+                (uploads_playlist_id, page_token, response.get('etag', ''), next_page_token, json.dumps(items))
+            )
+            for video_id, title in items:
+                # New videos are inserted; known ones keep their status until their details are refreshed
+                connection.execute(
+                    "INSERT INTO videos (video_id, title, number) VALUES (?, ?, ?) "
+                    "ON CONFLICT(video_id) DO UPDATE SET title = excluded.title, number = excluded.number",
+                    (video_id, title, extract_video_number(title, regex_pattern))
+                )
+
+        video_ids.update(video_id for video_id, _ in items)
+        if not next_page_token:
+            break
+        page_token = next_page_token
+
+    logging.info(f"Inventory sync: {fetched} playlist pages fetched, {reused} unchanged.")
+    return video_ids
+
+def sync_inventory_details(youtube, connection, numbered_ids, regex_pattern):
+    """Refresh privacy status and publishAt of (number, video_id) pairs by ranges of 50 numbers, each with its ETag.
+    A new upload only refetches its own range; a range holding more than 50 videos is split."""
+    ranges = {}
+    for number, video_id in sorted(numbered_ids):
+        ranges.setdefault(number // MAX_PAGE_SIZE * MAX_PAGE_SIZE, []).append(video_id)
+    fetched = reused = 0
+    for first_number, range_ids in sorted(ranges.items()):
+        for part, i in enumerate(range(0, len(range_ids), MAX_PAGE_SIZE)):
+            stored = connection.execute(
+                "SELECT etag FROM detail_ranges WHERE first_number = ? AND part = ?", (first_number, part)
+            ).fetchone()
+            try:
+                response = execute_conditional_request(youtube.videos().list(
+                    part="snippet,status",
+                    id=",".join(range_ids[i:i+MAX_PAGE_SIZE]),
+                    fields=VIDEO_FIELDS
+                ), "videos.list", stored[0] if stored else None)
+            except HttpError as e:
+                logging.error(f"Error fetching detailed video information for videos {first_number} to {first_number + MAX_PAGE_SIZE - 1}: {e}")
+                continue
+
+            if response is None:
+                reused += 1
+                continue
+            fetched += 1
+            for item in response.get('items', []):
+                video = video_record(item, regex_pattern)
+                connection.execute(
+                    "UPDATE videos SET title = ?, number = ?, privacy_status = ?, publish_at = ?, snippet_digest = ? WHERE video_id = ?",
+                    (video.title, video.number, video.privacy_status, video.publish_at, video.snippet_digest, video.id)
+                )
+            connection.execute("INSERT OR REPLACE INTO detail_ranges VALUES (?, ?, ?)", (first_number, part, response.get('etag', '')))
+
+    logging.info(f"Inventory sync: {fetched} detail chunks fetched, {reused} unchanged.")
+
+def sync_inventory(youtube, db_path, start_video_number, end_video_number, regex_pattern=CONTAINS_NUMBERS_REGEX):
+    """Bring the local inventory up to date with conditional requests. Returns False if it could not be synced."""
+    try:
+        uploads_playlist_id = get_uploads_playlist_id(youtube)
+    except HttpError as e:
+        logging.error(f"Error fetching the uploads playlist: {e}")
+        return False
+    if not uploads_playlist_id:
+        logging.warning("No uploads playlist found for this channel.")
+        return False
+
+    connection = open_inventory(db_path)
+    try:
+        with connection:
+            video_ids = sync_inventory_pages(youtube, connection, uploads_playlist_id, regex_pattern)
+            if video_ids is None:
+                return False
+            # Forget videos that were deleted from the channel
+            known_ids = {row[0] for row in connection.execute("SELECT video_id FROM videos")}
+            connection.executemany("DELETE FROM videos WHERE video_id = ?", [(video_id,) for video_id in known_ids - video_ids])
+
+            relevant_ids = connection.execute(
+                "SELECT number, video_id FROM videos WHERE number >= ? AND number < ?",
+                (start_video_number, end_video_number)
+            ).fetchall()
+            sync_inventory_details(youtube, connection, relevant_ids, regex_pattern)
+    finally:
+        connection.close()
+    return True
+
+def query_inventory(db_path, start_video_number, end_video_number):
+    """Return (draft_videos, scheduled_videos) of the number range from the local inventory, sorted by number."""
+    connection = open_inventory(db_path)
+    try:
+        rows = connection.execute(
+            "SELECT video_id, title, number, privacy_status, publish_at, snippet_digest FROM videos "
+            "WHERE number >= ? AND number < ? AND privacy_status IS NOT NULL ORDER BY number",
+            (start_video_number, end_video_number)
+        ).fetchall()
+    finally:
+        connection.close()
+
+    draft_videos = []
+    scheduled_videos = []
+    for row in rows:
+        video = VideoRecord(*row[:5], snippet_digest=row[5])
+        if video.is_scheduled:
+            scheduled_videos.append(video)
+        elif video.is_draft:
+            draft_videos.append(video)
+    return draft_videos, scheduled_videos
+
+def get_all_draft_videos_from_inventory(youtube, db_path, start_video_number=1, end_video_number=300, max_results=400, regex_pattern=CONTAINS_NUMBERS_REGEX, discovery_mode="search", max_in_flight=1):
+    """Same result as get_all_draft_videos, from the local inventory after an incremental sync of the uploads playlist.
+    discovery_mode and max_in_flight only apply to the fallback when the sync fails."""
+    if not sync_inventory(youtube, db_path, start_video_number, end_video_number, regex_pattern):
+        logging.warning("Inventory sync failed. Falling back to a full discovery.")
+        return get_all_draft_videos(youtube, start_video_number, end_video_number, max_results, regex_pattern, discovery_mode, max_in_flight)
+    draft_videos, scheduled_videos = query_inventory(db_path, start_video_number, end_video_number)
+    logging.info(f"Inventory: {len(draft_videos)} drafts and {len(scheduled_videos)} scheduled videos in range.")
+    return draft_videos, scheduled_videos
+
+
 def is_valid_date_format(date_str):
     """Check if the date is in the 'YYYY-MM-DD' format."""
     return bool(re.match(r'^\d{4}-\d{2}-\d{2}$', date_str))
@@ -169,7 +953,7 @@ def is_valid_date_format(date_str):
 def get_video_categories(youtube, region_code="US"):
     try:
         logging.debug("Fetching video categories.")
-        categories_response = youtube.videoCategories().list(part="snippet", regionCode=region_code).execute()
+        categories_response = execute_request(youtube.videoCategories().list(part="snippet", regionCode=region_code), "videoCategories.list")
         logging.debug(f"Received {len(categories_response.get('items', []))} categories.")
         return {category["snippet"]["title"]: category["id"] for category in categories_response.get("items", [])}
         
@@ -177,68 +961,524 @@ def get_video_categories(youtube, region_code="US"):
         logging.error(f"Error fetching video categories: {e}")
         return {}
 
+CATEGORY_CACHE = {}  # region code -> {category title: category ID}, loaded once per run
+
+def load_category_cache_file(cache_file, region_code, ttl_seconds):
+    if not cache_file or not os.path.exists(cache_file):
+        return None
+    try:
+        with open(cache_file, 'r') as f:
+            entry = json.load(f).get(region_code)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable category cache {cache_file}: {e}")
+        return None
+    if not entry or time.time() - entry["fetched_at"] > ttl_seconds:
+        return None
+    return entry["categories"]
+
+def save_category_cache_file(cache_file, region_code, categories):
+    data = {}
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+    data[region_code] = {"fetched_at": time.time(), "categories": categories}
+    # Written aside then renamed, like the quota ledger, so a killed run never leaves half a cache
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_file, cache_file)
+
+def get_cached_video_categories(youtube, region_code="US", cache_file=None, ttl_seconds=0):
+    """Return the categories of region_code from memory, then from cache_file, then from the API."""
+    if region_code in CATEGORY_CACHE:
+        return CATEGORY_CACHE[region_code]
+
+    categories = load_category_cache_file(cache_file, region_code, ttl_seconds)
+    if categories is not None:
+        logging.debug(f"Loaded video categories for {region_code} from {cache_file}.")
+    else:
+        categories = get_video_categories(youtube, region_code)
+        if not categories:
+            # Do not remember a failed lookup
+            return categories
+        if cache_file:
+            save_category_cache_file(cache_file, region_code, categories)
+
+    CATEGORY_CACHE[region_code] = categories
+    return categories
+
+def resolve_category_id(youtube, config):
+    """Resolve VIDEO_CATEGORY (a category name or ID) to a category ID, or None if it does not exist."""
+    category = config.get("VIDEO_CATEGORY", "Entertainment")
+    region_code = config.get("REGION_CODE", "US")
+    categories = get_cached_video_categories(
+        youtube,
+        region_code,
+        config.get("CATEGORY_CACHE_FILE"),
+        config.get("CATEGORY_CACHE_TTL", 0)
+    )
+    if category in categories:
+        return categories[category]
+    if category in categories.values():
+        return category
+    logging.error(f"Video category '{category}' not found for region {region_code}. Available categories: {', '.join(sorted(categories))}")
+    return None
+
+def resolve_run_category_id(youtube, config):
+    """resolve_category_id for a run about to write: logs the abort if there is no category."""
+    category_id = resolve_category_id(youtube, config)
+    if category_id is None:
+        logging.error("Aborting run before any update: no valid video category.")
+    return category_id
+
+def build_playlist_item_body(playlist_id, video_id, position=0):
+    """Body of a playlistItems().insert call. With position None, YouTube appends the video."""
+    body = {
+        "snippet": {
+            "playlistId": playlist_id,
+            "position": position,
+            "resourceId": {
+                "kind": "youtube#video",
+                "videoId": video_id
+            }
+        }
+    }
+    if position is None:
+        del body["snippet"]["position"]
+    return body
+
+def playlist_position(config):
+    """Insert position from PLAYLIST_POSITION: 0 for 'start', None (append) for 'end'."""
+    return None if config.get("PLAYLIST_POSITION", "start") == "end" else 0
+
+UPDATE_PARTS = ("snippet", "status")
+
+def build_video_update_body(video_id, title, publish_time, config, category_id, metadata=None, parts=UPDATE_PARTS):
+    """Body of a videos().update call with the given parts. metadata is the video's rendered description and tags, if any."""
+    metadata = metadata or {}
+    body = {
+        "id": video_id,
+        "snippet": {
+            "title": title,
+            "description": metadata.get("description", config["DESCRIPTION"]),
+            "categoryId": category_id,
+            "tags": metadata.get("tags", config["VIDEO_TAGS"])
+        },
+        "status": {
+            "publishAt": publish_time.isoformat(),
+            "privacyStatus": "private",
+            "madeForKids": False
+        }
+    }
+    for part in UPDATE_PARTS:
+        if part not in parts:
+            del body[part]
+    return body
+
+def video_update_parts(video, title, publish_time, config, category_id):
+    """The parts of the update that would change the video, in UPDATE_PARTS order: () if it is up to date.
+    Snippets are sent whole, and videos whose state was not fetched get both parts."""
+    metadata = video.metadata or {}
+    target_digest = snippet_digest(title, metadata.get("description", config["DESCRIPTION"]), metadata.get("tags", config["VIDEO_TAGS"]), category_id)
+    parts = []
+    if video.snippet_digest != target_digest:
+        parts.append("snippet")
+    if (video.privacy_status != "private" or not video.publish_at
+            or normalize_slot(parse_publish_at(video.publish_at), config_timezone(config)) != publish_time):
+        parts.append("status")
+    return tuple(parts)
+
+def diff_updates(videos_to_update, config, category_id, done_steps=frozenset()):
+    """Diff the planned updates not done yet. Returns the ("video_id", "update") steps with nothing
+    to change, and the counts of unchanged (skipped), partial (one part) and full updates.
+    """
+    unchanged_steps = set()
+    counts = {"unchanged": 0, "partial": 0, "full": 0}
+    for video, title, publish_time in videos_to_update:
+        if (video.id, "update") in done_steps:
+            continue
+        parts = video_update_parts(video, title, publish_time, config, category_id)
+        if not parts:
+            unchanged_steps.add((video.id, "update"))
+        counts["unchanged" if not parts else "full" if len(parts) == len(UPDATE_PARTS) else "partial"] += 1
+    return unchanged_steps, counts
+
+def refresh_video_states(youtube, videos_to_update):
+    """Fetch the current state of videos rebuilt from a journal or a plan (1 quota unit per 50 videos), so applied updates are skipped."""
+    planned = {video.id: video for video, _, _ in videos_to_update}
+    for _, fetched in iter_video_details(youtube, [(None, video_id) for video_id in planned]):
+        video = planned[fetched.id]
+        video.privacy_status, video.publish_at, video.snippet_digest = fetched.privacy_status, fetched.publish_at, fetched.snippet_digest
+
+MAX_TITLE_LENGTH = 100
+
+def title_skip_reason(title):
+    """Return why the API would reject title, or None if it is valid."""
+    if not title or len(title.strip()) == 0:
+        return "empty title"
+    elif len(title) > MAX_TITLE_LENGTH:
+        return f"title longer than {MAX_TITLE_LENGTH} characters"
+    elif "<" in title or ">" in title:
+        return "title contains < or >"
+    return None
+
+MAX_DESCRIPTION_BYTES = 5000
+MAX_TAGS_LENGTH = 500
+
+def description_skip_reason(description):
+    """Return why the API would reject description, or None if it is valid."""
+    if len(description.encode('utf-8')) > MAX_DESCRIPTION_BYTES:
+        return f"description longer than {MAX_DESCRIPTION_BYTES} bytes"
+    elif "<" in description or ">" in description:
+        return "description contains < or >"
+    return None
+
+def tags_skip_reason(tags):
+    """Return why the API would reject tags, counting commas and the quotes around tags with spaces, or None if they are valid."""
+    length = sum(len(tag) + (2 if " " in tag else 0) for tag in tags) + max(len(tags) - 1, 0)
+    if length > MAX_TAGS_LENGTH:
+        return f"tags longer than {MAX_TAGS_LENGTH} characters in total ({length})"
+    return None
+
+def is_valid_title(video, title):
+    """Check the processed title before sending it, logging why it is rejected."""
+    reason = title_skip_reason(title)
+    if reason == "empty title":
+        logging.error(f"Attempted to set an empty title for video: {video.title}. Skipping update.")
+        return False
+    elif reason:
+        logging.error(f"Invalid title for video {video.title} ({reason}). Title: {title}. Skipping update.")
+        return False
+    return True
+
+# ---------------- Playlist Membership ----------------
+
+PLAYLIST_MEMBERS = {}  # playlist ID -> set of the video IDs it contains
+PLAYLIST_LOCK = threading.Lock()
+
+def get_playlist_members(youtube, playlist_id):
+    """Return the video IDs in playlist_id, listed once per process and kept up to date by add_to_playlist. None if it cannot be listed."""
+    with PLAYLIST_LOCK:
+        if playlist_id in PLAYLIST_MEMBERS:
+            return PLAYLIST_MEMBERS[playlist_id]
+    members = set()
+    pages = 0
+    try:
+        for playlist_response in iter_playlist_pages(youtube, playlist_id, part="contentDetails"):
+            pages += 1
+            members.update(item['contentDetails']['videoId'] for item in playlist_response.get('items', []))
+    except HttpError as e:
+        logging.error(f"Error listing playlist {playlist_id}. Existing members will not be skipped: {e}")
+        return None
+    logging.info(f"Playlist {playlist_id} has {len(members)} videos ({pages} pages).")
+    with PLAYLIST_LOCK:
+        return PLAYLIST_MEMBERS.setdefault(playlist_id, members)
+
+def add_playlist_member(playlist_id, video_id):
+    with PLAYLIST_LOCK:
+        if playlist_id in PLAYLIST_MEMBERS:
+            PLAYLIST_MEMBERS[playlist_id].add(video_id)
+
+def member_steps(youtube, playlist_id, videos_to_update):
+    """The ("video_id", "playlist_insert") steps already done because the video is in the playlist."""
+    members = get_playlist_members(youtube, playlist_id) or set()
+    with PLAYLIST_LOCK:
+        return {(video.id, "playlist_insert") for video, _, _ in videos_to_update if video.id in members}
+
 # Add to playlist
-def add_to_playlist(youtube, playlist_id, video_id):
+def add_to_playlist(youtube, playlist_id, video_id, position=0):
+    return run_async(add_to_playlist_async(youtube, playlist_id, video_id, position))
+
+async def add_to_playlist_async(youtube, playlist_id, video_id, position=0, limit=None):
     request = youtube.playlistItems().insert(
         part="snippet",
-        body={
-            "snippet": {
-                "playlistId": playlist_id,
-                "position": 0,
-                "resourceId": {
-                    "kind": "youtube#video",
-                    "videoId": video_id
-                }
-            }
-        }
+        body=build_playlist_item_body(playlist_id, video_id, position)
     )
-    response = request.execute()
+    response = await execute_request_async(request, "playlistItems.insert", limit)
+    add_playlist_member(playlist_id, video_id)
     return response
 
 def update_video(youtube, video, publish_time, config ):
+    return run_async(update_video_async(youtube, video, publish_time, config))
+
+async def update_video_async(youtube, video, publish_time, config, limit=None):
     
     title = process_video_title(video, config["TITLE_PREFIX"], config["TITLE_SUFFIX"])
-    video_categories = get_video_categories(youtube)
-    category_id = video_categories["Entertainment"]
+    category_id = await asyncio.to_thread(resolve_category_id, youtube, config)
+    if category_id is None:
+        return
 
     # Vérification du titre
-    if not title or len(title.strip()) == 0:
-        logging.error(f"Attempted to set an empty title for video: {video['snippet']['title']}. Skipping update.")
+    if not is_valid_title(video, title):
         return
-    elif len(title) > 100:
-        logging.error(f"Title length for video {video['snippet']['title']} exceeds the maximum limit. Title: {title}. Skipping update.")
+
+    video_id = video.id
+    parts = video_update_parts(video, title, publish_time, config, category_id)
+    if not parts:
+        logging.info(f"Video {video.title} is already up to date. Skipping update.")
         return
+    request = youtube.videos().update(
+        part=",".join(parts),
+        body=build_video_update_body(video_id, title, publish_time, config, category_id, video.metadata, parts)
+    )
+    # Permanent errors are raised to the caller so the video is not counted as updated
+    return await execute_request_async(request, "videos.update", limit)
 
-    video_id = video['id']
-    try:
-        request = youtube.videos().update(
-            part="snippet,status",
-            body={
-                "id": video_id,
-                "snippet": {
-                    "title": title,
-                    "description": config["DESCRIPTION"],
-                    "categoryId": category_id,
-                    "tags": config["VIDEO_TAGS"]
-                },
-                "status": {
-                    "publishAt": publish_time.isoformat(),
-                    "privacyStatus": "private",
-                    "madeForKids": False
-                }
-            }
-        )
-        response = request.execute()
-        
-    except Exception as e:
-        # Gérer l'erreur ici, par exemple, en enregistrant l'erreur dans un journal
-        print(f"Une erreur s'est produite lors de la mise à jour de la vidéo : {str(e)}")
-        return None  # Ou renvoyez une valeur par défaut ou raise une exception personnalisée si nécessaire
+# ---------------- Batch Requests ----------------
+
+BATCH_LIMIT = 50  # Maximum number of calls sent in one HTTP batch request
+
+def execute_batch(youtube, keyed_requests, batch_limit=BATCH_LIMIT, method=None):
+    """Send (key, request) pairs as batches of at most batch_limit calls. Returns key -> (response, exception).
+    Retriable failures are sent again with backoff; keys not sent once the quota is exhausted are left out."""
+    results = {}
+
+    def callback(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    metrics_method = method or "batch"
+    for _, request in keyed_requests:
+        measure_response_size(request, metrics_method)
+
+    for i in range(0, len(keyed_requests), batch_limit):
+        pending = keyed_requests[i:i+batch_limit]
+        for attempt in range(REQUEST_SETTINGS["max_retries"] + 1):
+            batch = youtube.new_batch_http_request(callback=callback)
+            for key, request in pending:
+                batch.add(request, request_id=key)
+            try:
+                acquire_rate_limit(len(pending))
+                if method:
+                    charge_quota(method, len(pending))
+                start = time.perf_counter()
+                batch.execute()
+                logging.debug("Executed batch of %d requests starting with %d.", len(pending), i)
+            except retriable_exceptions() + (HttpError,) as e:
+                logging.error(f"Error executing batch starting with {i}: {e}")
+                # The batch itself failed, so none of its items got a callback
+                for key, _ in pending:
+                    results[key] = (None, e)
+            record_api_call(metrics_method, time.perf_counter() - start, len(pending),
+                            sum(1 for key, _ in pending if results.get(key, (None, None))[1] is not None))
+
+            pending = [(key, request) for key, request in pending if is_retriable(results[key][1])]
+            if not pending or attempt == REQUEST_SETTINGS["max_retries"]:
+                break
+            record_retries(metrics_method, len(pending))
+            delay = backoff_delay(attempt)
+            logging.warning(f"Retrying {len(pending)} batched requests in {delay:.1f}s (attempt {attempt + 1}).")
+            time.sleep(delay)
+        save_quota_ledger()
+
+        if any(is_quota_exceeded(results[key][1]) for key, _ in keyed_requests[i:i+batch_limit]):
+            logging.error("Quota exceeded. Not sending the remaining batches.")
+            break
+
+    return results
+
+def batch_update_videos(youtube, videos_to_update, config, category_id, done_steps=frozenset(), playlist_inserts=True):
+    """Update (video, title, publish_time) videos through batch requests, then add them to the playlist in schedule order.
+    Returns video ID -> update, playlist_insert and error; with playlist_inserts False the inserts are left "skipped"."""
+    report = {}
+    update_requests = []
+    journal_file = config.get("JOURNAL_FILE")
+    videos_resource = api_resource(youtube, "videos")
+
+    for video, title, publish_time in videos_to_update:
+        video_id = video.id
+        report[video_id] = {"update": "skipped", "playlist_insert": "skipped", "error": None}
+        if (video_id, "update") in done_steps:
+            report[video_id]["update"] = "done"
+        else:
+            if not is_valid_title(video, title):
+                report[video_id]["error"] = "invalid title"
+                continue
+            parts = video_update_parts(video, title, publish_time, config, category_id)
+            if parts:
+                request = videos_resource.update(
+                    part=",".join(parts),
+                    body=build_video_update_body(video_id, title, publish_time, config, category_id, video.metadata, parts)
+                )
+                update_requests.append((video_id, request))
+                continue
+            report[video_id]["update"] = "unchanged"
+            record_step(journal_file, video_id, "update")
+        if (video_id, "playlist_insert") in done_steps:
+            report[video_id]["playlist_insert"] = "done"
+
+    for video_id, (response, error) in execute_batch(youtube, update_requests, method="videos.update").items():
+        if error is not None:
+            report[video_id]["update"] = "failed"
+            report[video_id]["error"] = str(error)
+            logging.error(f"Error updating video {video_id}: {error}")
+            continue
+        report[video_id]["update"] = "ok"
+        record_step(journal_file, video_id, "update")
+        if (video_id, "playlist_insert") in done_steps:
+            report[video_id]["playlist_insert"] = "done"
+
+    if playlist_inserts:
+        insert_in_schedule_order(youtube, videos_to_update, report, config)
+    return report
+
+def insert_in_schedule_order(youtube, videos_to_update, report, config):
+    """Add the videos whose update succeeded or was not needed to the playlist, one at a time in schedule order."""
+    playlist_items_resource = api_resource(youtube, "playlistItems")
+    journal_file = config.get("JOURNAL_FILE")
+    insert_requests = [
+        (video.id, build_playlist_insert_request(playlist_items_resource, config, video.id))
+        for video, _, _ in videos_to_update
+        if report[video.id]["update"] in ("ok", "done", "unchanged") and report[video.id]["playlist_insert"] == "skipped"
+    ]
+    for video_id, (response, error) in execute_inserts_in_order(insert_requests).items():
+        if error is not None:
+            report[video_id]["playlist_insert"] = "failed"
+            report[video_id]["error"] = str(error)
+            logging.error(f"Error adding video {video_id} to playlist {config['PLAYLIST_ID']}: {error}")
+        else:
+            report[video_id]["playlist_insert"] = "ok"
+            add_playlist_member(config["PLAYLIST_ID"], video_id)
+            record_step(journal_file, video_id, "playlist_insert")
+
+def build_playlist_insert_request(playlist_items_resource, config, video_id):
+    return playlist_items_resource.insert(
+        part="snippet",
+        body=build_playlist_item_body(config["PLAYLIST_ID"], video_id, playlist_position(config))
+    )
+
+def execute_inserts_in_order(insert_requests):
+    """Send playlist inserts one at a time, in order, with the same results as execute_batch."""
+    results = {}
+    for video_id, request in insert_requests:
+        try:
+            results[video_id] = (execute_request(request, "playlistItems.insert"), None)
+        except retriable_exceptions() + (HttpError,) as e:
+            results[video_id] = (None, e)
+            if is_quota_exceeded(e):
+                logging.error("Quota exceeded. Not sending the remaining playlist inserts.")
+                break
+    return results
 
 # ---------------- Video Processing ----------------
 
 def process_video_title(video, TITLE_PREFIX, TITLE_SUFFIX):
-    return TITLE_PREFIX + video['snippet']['title'] + TITLE_SUFFIX
+    return TITLE_PREFIX + video.title + TITLE_SUFFIX
+
+# ---------------- Metadata Templates ----------------
+
+TEMPLATE_FIELDS = ("number", "title", "prefix", "suffix", "publish_time", "date")
+COMPILED_TEMPLATES = {}  # (template, fields) -> parsed template parts
+TEMPLATE_FORMATTER = string.Formatter()
+
+def load_metadata_file(metadata_file):
+    """Read per-video metadata rows from CSV (with a "number" column) or JSON, keyed by video number. Returns {} without a file."""
+    if not metadata_file:
+        return {}
+    with open(metadata_file, 'r', encoding='utf-8', newline='') as f:
+        if metadata_file.endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            data = json.load(f)
+            rows = [dict(row, number=number) for number, row in data.items()] if isinstance(data, dict) else data
+    metadata = {}
+    for row in rows:
+        number = int(row["number"])
+        if number in metadata:
+            raise ValueError(f"video {number} appears twice in {metadata_file}")
+        metadata[number] = {key: ",".join(map(str, value)) if isinstance(value, list) else value for key, value in row.items() if key != "number"}
+    logging.info(f"Loaded metadata of {len(metadata)} videos from {metadata_file}.")
+    return metadata
+
+def compile_template(template, fields):
+    """Parse a str.format-style template once into its parts. Raises ValueError on bad syntax or a field not in fields."""
+    key = (template, fields)
+    if key not in COMPILED_TEMPLATES:
+        parts = list(TEMPLATE_FORMATTER.parse(template))
+        unknown = sorted({field for _, field, _, _ in parts if field is not None and field not in fields})
+        if unknown:
+            raise ValueError(f"unknown field {', '.join('{' + field + '}' for field in unknown)} in {template!r}")
+        COMPILED_TEMPLATES[key] = parts
+    return COMPILED_TEMPLATES[key]
+
+def render_template(parts, values):
+    """Render the parts of a compiled template. Raises KeyError for a field missing from values."""
+    return "".join(
+        literal if field is None else literal + format(TEMPLATE_FORMATTER.convert_field(values[field], conversion), spec)
+        for literal, field, spec, conversion in parts
+    )
+
+def compile_metadata_templates(config):
+    """Compile TITLE_TEMPLATE, DESCRIPTION_TEMPLATE and TAGS_TEMPLATE, None for those not set."""
+    columns = {column for row in (config.get("METADATA") or {}).values() for column in row}
+    fields = TEMPLATE_FIELDS + tuple(sorted(columns - set(TEMPLATE_FIELDS)))
+    return {
+        name: compile_template(config[key], fields) if config.get(key) else None
+        for name, key in (("title", "TITLE_TEMPLATE"), ("description", "DESCRIPTION_TEMPLATE"), ("tags", "TAGS_TEMPLATE"))
+    }
+
+def render_metadata(videos_to_update, config):
+    """Render the metadata templates for every planned (video, title, publish_time) and check them against the API limits.
+    Returns the updated list and a dict of video ID -> every problem found."""
+    templates = compile_metadata_templates(config)
+    metadata = config.get("METADATA") or {}
+    prefix, suffix = config.get("TITLE_PREFIX") or "", config.get("TITLE_SUFFIX") or ""
+    rendered = []
+    problems = {}
+    for video, title, publish_time in videos_to_update:
+        number = video.number if video.number is not None else extract_video_number(video.title)
+        values = {"number": number, "title": video.title, "prefix": prefix, "suffix": suffix,
+                  "publish_time": publish_time, "date": publish_time.date(), **metadata.get(number, {})}
+        video_problems = []
+        video_metadata = {}
+        for name, parts in templates.items():
+            if parts is None:
+                continue
+            try:
+                value = render_template(parts, values)
+            except KeyError as e:
+                video_problems.append(f"no {e.args[0]!r} for video {number} in METADATA_FILE")
+                continue
+            except ValueError as e:
+                video_problems.append(f"cannot render the {name}: {e}")
+                continue
+            if name == "title":
+                title = value
+            elif name == "description":
+                video_metadata["description"] = value
+            else:
+                video_metadata["tags"] = [tag.strip() for tag in value.split(",") if tag.strip()]
+
+        reasons = [title_skip_reason(title)]
+        if "description" in video_metadata:
+            reasons.append(description_skip_reason(video_metadata["description"]))
+        if "tags" in video_metadata:
+            reasons.append(tags_skip_reason(video_metadata["tags"]))
+        video_problems += [reason for reason in reasons if reason]
+        if video_problems:
+            problems[video.id] = video_problems
+        video.metadata = video_metadata or None
+        rendered.append((video, title, publish_time))
+    return rendered, problems
+
+def log_metadata_problems(problems, videos):
+    """Log every problem found by render_metadata, all at once."""
+    for video in videos:
+        for problem in problems.get(video.id, []):
+            logging.error(f"Video {video.title} ({video.id}): {problem}.")
+    logging.error(f"{len(problems)} videos have invalid metadata and are skipped. Fix the templates, METADATA_FILE or titles.")
+
+def skip_invalid_videos(videos_to_update, problems):
+    """Drop the videos render_metadata found problems with. Returns the others and a report of the skipped ones."""
+    if problems:
+        log_metadata_problems(problems, [video for video, _, _ in videos_to_update])
+    skipped = {
+        video_id: {"update": "skipped", "playlist_insert": "skipped", "error": "; ".join(video_problems)}
+        for video_id, video_problems in problems.items()
+    }
+    return [entry for entry in videos_to_update if entry[0].id not in problems], skipped
 
 def calculate_publish_time(start_date, index, first_interval, second_interval, videos_per_day):
     if videos_per_day == 1:
@@ -251,101 +1491,835 @@ def calculate_publish_time(start_date, index, first_interval, second_interval, v
             hour = random.randint(second_interval[0], second_interval[1])
         return start_date + datetime.timedelta(days=index//2, hours=hour)
     else:
-        logging.error("Unsupported number of videos per day.")
-        return start_date
+        return build_slot_table(start_date, index + 1, [first_interval, second_interval], videos_per_day)[index]
 
+# ---------------- Slot Scheduling ----------------
 
-# ---------------- Scenarios ----------------
+def parse_publish_windows(value):
+    """Parse daily publish windows such as '1-9,13-23' into [(1, 9), (13, 23)] (hours, inclusive)."""
+    windows = []
+    for part in value.split(','):
+        start, end = part.strip().split('-')
+        windows.append((int(start), int(end)))
+    return windows
+
+def parse_publish_at(value):
+    """Parse a publishAt timestamp ('2023-10-19T12:00:00Z' or with milliseconds) to an aware UTC datetime."""
+    return datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(datetime.timezone.utc)
+
+def window_slots(day, window, slot_minutes, timezone=None):
+    """All the slots of a window on day, both hours included, leaving out local times skipped by a daylight saving change."""
+    start_hour, end_hour = window
+    midnight = datetime.datetime(day.year, day.month, day.day, tzinfo=timezone)
+    slots = [midnight + timedelta(minutes=minutes) for minutes in range(start_hour * 60, end_hour * 60 + 1, slot_minutes)]
+    if timezone:
+        slots = [slot for slot in slots if slot.astimezone(datetime.timezone.utc).astimezone(timezone) == slot]
+    return slots
+
+def pick_stratified(rng, slots, count):
+    """Pick count slots, one at random in each of count equal parts of slots, so they stay spread out."""
+    if count >= len(slots):
+        return list(slots)
+    return [rng.choice(slots[k * len(slots) // count:(k + 1) * len(slots) // count]) for k in range(count)]
+
+def normalize_slot(slot, timezone=None):
+    """Return the instant of slot as the slot table compares them: aware UTC with a timezone, so both fall-back 1:30 differ."""
+    if timezone:
+        return slot.replace(tzinfo=timezone).astimezone(datetime.timezone.utc) if slot.tzinfo is None else slot.astimezone(datetime.timezone.utc)
+    return slot.astimezone(datetime.timezone.utc).replace(tzinfo=None) if slot.tzinfo else slot
+
+def iter_slots(start_date, windows, videos_per_day, timezone=None, blackout_dates=(), taken=None, seed=None, slot_minutes=60):
+    """Yield distinct publish times, videos_per_day per day from start_date, never reusing and then adding to the instants in taken.
+    Stops after a year of days without any free slot."""
+    if videos_per_day < 1 or not windows:
+        raise ValueError("At least one publish window and one video per day are needed to build a schedule.")
+    rng = random.Random(seed)
+    blackout_dates = set(blackout_dates)
+    taken = set() if taken is None else taken
+
+    day = start_date.date() if isinstance(start_date, datetime.datetime) else start_date
+    idle_days = 0
+    while idle_days < 366:
+        if day not in blackout_dates:
+            free = [
+                [slot for slot in window_slots(day, window, slot_minutes, timezone) if normalize_slot(slot, timezone) not in taken]
+                for window in windows
+            ]
+            if videos_per_day % len(windows) == 0:
+                per_window = videos_per_day // len(windows)
+                picked = [slot for slots in free for slot in pick_stratified(rng, slots, per_window)]
+            else:
+                picked = pick_stratified(rng, sorted(set(slot for slots in free for slot in slots)), videos_per_day)
+            picked = sorted(set(picked))
+            taken.update(normalize_slot(slot, timezone) for slot in picked)
+            idle_days = 0 if picked else idle_days + 1
+            yield from picked
+        day += timedelta(days=1)
+
+def take_slots(slots, count):
+    """Take the next count slots of an iter_slots iterator."""
+    table = list(itertools.islice(slots, count))
+    if len(table) < count:
+        raise ValueError(f"Could only find {len(table)} free publish slots for {count} videos.")
+    return table
+
+def build_slot_table(start_date, count, windows, videos_per_day, timezone=None, blackout_dates=(), taken=(), seed=None, slot_minutes=60):
+    """Precompute count distinct publish times, videos_per_day per day from start_date, skipping blackout_dates and taken.
+    seed makes the table reproducible; with a timezone the slots are aware datetimes in it."""
+    if videos_per_day < 1 or not windows:
+        raise ValueError("At least one publish window and one video per day are needed to build a schedule.")
+    taken = {normalize_slot(slot, timezone) for slot in taken}
+    return take_slots(iter_slots(start_date, windows, videos_per_day, timezone, blackout_dates, taken, seed, slot_minutes), count)
+
+def config_timezone(config):
+    return ZoneInfo(config["TIMEZONE"]) if config.get("TIMEZONE") else None
+
+def config_slots(config, taken):
+    """Return the iter_slots iterator of a run, never using the instants in taken (see normalize_slot)."""
+    return iter_slots(
+        config["START_DATE"],
+        config.get("PUBLISH_WINDOWS") or [config["FIRST_INTERVAL"], config["SECOND_INTERVAL"]],
+        config["VIDEOS_PER_DAY"],
+        timezone=config_timezone(config),
+        blackout_dates=config.get("BLACKOUT_DATES", ()),
+        taken=taken,
+        seed=config.get("SCHEDULE_SEED"),
+        slot_minutes=config.get("SLOT_MINUTES", 60)
+    )
+
+def schedule_config_slots(config, count):
+    """Build the slot table of a run from its configuration."""
+    timezone = config_timezone(config)
+    taken = {normalize_slot(parse_publish_at(value), timezone) for value in config.get("TAKEN_SLOTS", [])}
+    return take_slots(config_slots(config, taken), count)
+
+
+# ---------------- Run Journal ----------------
+
+JOURNAL_LOCK = threading.Lock()  # Batches may finish on several worker threads
+
+def append_journal_entry(journal_file, entry):
+    with JOURNAL_LOCK:
+        with open(journal_file, 'ab+') as f:
+            # Start on a fresh line if a previous run died in the middle of an entry
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write((json.dumps(entry) + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+
+def planned_video_entry(video, title, publish_time):
+    """Serialize a (video, title, publish_time) tuple, with its rendered metadata, for the journal or a plan file."""
+    return {
+        "video_id": video.id,
+        "source_title": video.title,
+        "title": title,
+        "publish_time": publish_time.isoformat(),
+        **(video.metadata or {})
+    }
+
+def planned_video_to_update(planned):
+    metadata = {key: planned[key] for key in ("description", "tags") if key in planned}
+    return (
+        VideoRecord(planned["video_id"], planned["source_title"], metadata=metadata or None),
+        planned["title"],
+        datetime.datetime.fromisoformat(planned["publish_time"])
+    )
+
+def start_journal(journal_file, videos_to_update):
+    """Start a new journal recording the planned (video_id, title, publish_time) list."""
+    if not journal_file:
+        return
+    with JOURNAL_LOCK:
+        open(journal_file, 'w').close()
+    append_journal_entry(journal_file, {
+        "event": "plan",
+        "videos": [planned_video_entry(*entry) for entry in videos_to_update]
+    })
+    logging.info(f"Started run journal {journal_file} with {len(videos_to_update)} planned videos.")
+
+def extend_journal(journal_file, videos_to_update):
+    """Add planned (video, title, publish_time) entries to the plan of a journal, for runs planned as they go."""
+    if journal_file and videos_to_update:
+        append_journal_entry(journal_file, {
+            "event": "planned",
+            "videos": [planned_video_entry(*entry) for entry in videos_to_update]
+        })
+
+def record_step(journal_file, video_id, step):
+    """Mark a step ("update" or "playlist_insert") of a video as done."""
+    if journal_file:
+        append_journal_entry(journal_file, {"event": "done", "video_id": video_id, "step": step})
+
+def load_journal(journal_file):
+    """Read a journal back as (videos_to_update, done_steps), or None if there is no plan to resume."""
+    if not journal_file or not os.path.exists(journal_file):
+        logging.warning(f"No run journal found at {journal_file}.")
+        return None
+
+    videos_to_update = None
+    done_steps = set()
+    with open(journal_file, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line may be cut short if the run died while writing it
+                logging.warning(f"Ignoring truncated journal line: {line!r}")
+                continue
+            if entry["event"] == "plan":
+                videos_to_update = [planned_video_to_update(planned) for planned in entry["videos"]]
+            elif entry["event"] == "planned" and videos_to_update is not None:
+                videos_to_update += [planned_video_to_update(planned) for planned in entry["videos"]]
+            elif entry["event"] == "done":
+                done_steps.add((entry["video_id"], entry["step"]))
+
+    if videos_to_update is None:
+        logging.warning(f"Run journal {journal_file} has no plan.")
+        return None
+    return videos_to_update, done_steps
+
+# ---------------- Concurrent Execution ----------------
+
+def make_client_factory(creds):
+    """Return a callable building a new YouTube client that shares creds."""
+    def client_factory():
+        return build('youtube', 'v3', credentials=creds)
+    return client_factory
+
+def run_concurrently(client_factory, func, items, concurrency):
+    """Call func(client, item) for every item on concurrency threads, each with its own client_factory client. Results keep the order of items."""
+    local = threading.local()
+
+    def worker(item):
+        if not hasattr(local, 'youtube'):
+            local.youtube = client_factory()
+        return func(local.youtube, item)
 
-def update_videos(youtube, videos, config):
-    quota_counter = 0
-    MAX_QUOTA = 100000  # Daily quota limit
-    start_date = config["START_DATE"]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(worker, items))
 
-    quota_counter += 1  # Assume 1 unit for fetching categories
+# ---------------- Async Backend ----------------
 
+class PooledHttp:
+    """httplib2-style transport for googleapiclient over one thread-safe keep-alive requests session, signed with the run's credentials."""
+
+    def __init__(self, credentials=None, pool_size=10, timeout=60):
+        import requests
+        from google.auth.transport.requests import AuthorizedSession
+        self.credentials = credentials
+        self.session = AuthorizedSession(credentials) if credentials else requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = timeout
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=5, connection_type=None):
+        import httplib2
+        response = self.session.request(method, uri, data=body, headers=headers, timeout=self.timeout)
+        # requests already decompressed the body
+        info = {name.lower(): value for name, value in response.headers.items() if name.lower() != "content-encoding"}
+        info["status"] = str(response.status_code)
+        return httplib2.Response(info), response.content
+
+    def close(self):
+        self.session.close()
+
+def build_pooled_client(creds, pool_size=10):
+    """Build a YouTube client on a PooledHttp, that the async backend can use from several threads at once."""
+    return build('youtube', 'v3', http=PooledHttp(creds, pool_size))
+
+# The API calls block, so the async backend is a thread pool driven by asyncio: one event loop on
+# a background thread, whose default executor runs the calls. Both are created once per process.
+ASYNC_RUNNER = {"pid": None, "loop": None, "thread": None, "executor": None, "workers": 0}
+ASYNC_RUNNER_LOCK = threading.Lock()
+
+def async_runner_loop(max_in_flight=1):
+    """Return the shared event loop, starting it on first use, with at least max_in_flight worker threads."""
+    with ASYNC_RUNNER_LOCK:
+        if ASYNC_RUNNER["pid"] != os.getpid():
+            # First use, or a forked child whose copy of the loop has no thread running it
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="async-runner", daemon=True)
+            thread.start()
+            ASYNC_RUNNER.update({"pid": os.getpid(), "loop": loop, "thread": thread, "executor": None, "workers": 0})
+        loop = ASYNC_RUNNER["loop"]
+        if ASYNC_RUNNER["workers"] < max_in_flight:
+            previous = ASYNC_RUNNER["executor"]
+            executor = ThreadPoolExecutor(max_workers=max(1, max_in_flight), thread_name_prefix="api-call")
+            asyncio.run_coroutine_threadsafe(set_default_executor(executor), loop).result()
+            ASYNC_RUNNER.update({"executor": executor, "workers": max(1, max_in_flight)})
+            if previous is not None:
+                # Calls already running on the smaller pool finish there
+                previous.shutdown(wait=False)
+        return loop
+
+async def set_default_executor(executor):
+    asyncio.get_running_loop().set_default_executor(executor)
+
+def run_async(coroutine, max_in_flight=1):
+    """Run coroutine on the shared event loop with max_in_flight worker threads, blocking until it is done."""
+    loop = async_runner_loop(max_in_flight)
+    if threading.current_thread() is ASYNC_RUNNER["thread"]:
+        raise RuntimeError("run_async cannot be called from the shared event loop itself; await the coroutine instead.")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+async def execute_request_async(request, method, limit=None):
+    """execute_request on a worker thread, once the limit semaphore has a free slot."""
+    if limit is None:
+        return await asyncio.to_thread(execute_request, request, method)
+    async with limit:
+        return await asyncio.to_thread(execute_request, request, method)
+
+async def update_videos_async(youtube, videos_to_update, config, category_id, done_steps=frozenset(), max_in_flight=1):
+    """Update videos with one API call per step, max_in_flight videos at a time, then insert them in schedule order.
+    Returns the same report as batch_update_videos; once the quota is exhausted, videos not started yet are left "skipped"."""
+    limit = asyncio.Semaphore(max_in_flight)
+    journal_file = config.get("JOURNAL_FILE")
+    videos_resource = api_resource(youtube, "videos")
+    playlist_items_resource = api_resource(youtube, "playlistItems")
+    quota_exceeded = asyncio.Event()
+    report = {}
+
+    async def run_step(video_id, step, request, method):
+        """Send one call and record its outcome in the report and the journal. Returns True on success."""
+        try:
+            await execute_request_async(request, method)
+        except retriable_exceptions() + (HttpError,) as e:
+            report[video_id][step] = "failed"
+            report[video_id]["error"] = str(e)
+            logging.error(f"Error sending {method} for video {video_id}: {e}")
+            if is_quota_exceeded(e) and not quota_exceeded.is_set():
+                quota_exceeded.set()
+                logging.error("Quota exceeded. Stopping updates; run with --resume on the next quota day.")
+            return False
+        report[video_id][step] = "ok"
+        if step == "playlist_insert":
+            add_playlist_member(config["PLAYLIST_ID"], video_id)
+        record_step(journal_file, video_id, step)
+        return True
+
+    def insert_request(video_id):
+        return build_playlist_insert_request(playlist_items_resource, config, video_id)
+
+    async def update_one(video, title, publish_time):
+        video_id = video.id
+        result = report[video_id] = {"update": "skipped", "playlist_insert": "skipped", "error": None}
+        async with limit:
+            if quota_exceeded.is_set():
+                return
+            parts = None
+            if (video_id, "update") in done_steps:
+                result["update"] = "done"
+            elif not is_valid_title(video, title):
+                result["error"] = "invalid title"
+                return
+            else:
+                parts = video_update_parts(video, title, publish_time, config, category_id)
+            if parts:
+                request = videos_resource.update(
+                    part=",".join(parts),
+                    body=build_video_update_body(video_id, title, publish_time, config, category_id, video.metadata, parts)
+                )
+                # Only videos that were updated go to the playlist
+                if not await run_step(video_id, "update", request, "videos.update"):
+                    return
+            elif parts is not None:
+                result["update"] = "unchanged"
+                record_step(journal_file, video_id, "update")
+            if (video_id, "playlist_insert") in done_steps:
+                result["playlist_insert"] = "done"
+
+    await asyncio.gather(*(update_one(*entry) for entry in videos_to_update))
+
+    # Inserts land in the order they are sent
+    for video, _, _ in videos_to_update:
+        if quota_exceeded.is_set():
+            break
+        result = report[video.id]
+        if result["update"] in ("ok", "done", "unchanged") and result["playlist_insert"] == "skipped":
+            await run_step(video.id, "playlist_insert", insert_request(video.id), "playlistItems.insert")
+    return report
+
+def update_videos_individually(youtube, videos_to_update, config, category_id, done_steps=frozenset(), max_in_flight=1):
+    """Synchronous wrapper of update_videos_async. max_in_flight > 1 needs a client from build_pooled_client."""
+    report = run_async(update_videos_async(youtube, videos_to_update, config, category_id, done_steps, max_in_flight), max_in_flight)
+    log_update_report(videos_to_update, report, config)
+    return report
+
+# ---------------- Streaming Pipeline ----------------
+
+def iter_relevant_video_ids(youtube, start_video_number, end_video_number, max_results=400, regex_pattern=CONTAINS_NUMBERS_REGEX, discovery_mode="search"):
+    """Yield (number, video_id) for the relevant videos, page by page. A failed page ends the stream, with no fallback to search."""
+    pages = None
+    if discovery_mode == "uploads":
+        try:
+            uploads_playlist_id = get_uploads_playlist_id(youtube)
+        except HttpError as e:
+            logging.error(f"Error fetching the uploads playlist: {e}")
+            uploads_playlist_id = None
+        if uploads_playlist_id:
+            pages = iter_playlist_pages(youtube, uploads_playlist_id)
+            item_video_id = lambda item: item['snippet']['resourceId']['videoId']
+        else:
+            logging.warning("Uploads playlist not available. Falling back to search discovery.")
+    if pages is None:
+        pages = iter_search_pages(youtube, max_results)
+        item_video_id = lambda item: item['id']['videoId']
+
+    try:
+        for page in pages:
+            for item in page.get('items', []):
+                title = item['snippet']['title']
+                if is_relevant_title(title, start_video_number, end_video_number, regex_pattern):
+                    yield extract_video_number(title, regex_pattern), item_video_id(item)
+    except HttpError as e:
+        logging.error(f"Error fetching a discovery page. Stopping discovery: {e}")
+
+def iter_video_details(youtube, numbered_ids, chunk_size=MAX_PAGE_SIZE, fields=VIDEO_FIELDS):
+    """Fetch the details of (number, video_id) pairs chunk_size IDs at a time, yielding (number, VideoRecord) in the same order."""
+    videos_resource = api_resource(youtube, "videos")
+
+    def fetch(chunk):
+        try:
+            videos_response = execute_request(videos_resource.list(
+                part="snippet,status",
+                id=",".join(video_id for _, video_id in chunk),
+                fields=fields
+            ), "videos.list")
+        except HttpError as e:
+            logging.error(f"Error fetching detailed video information for {len(chunk)} videos: {e}")
+            return []
+        videos = {video['id']: video for video in videos_response.get('items', [])}
+        records = []
+        for number, video_id in chunk:
+            if video_id in videos:
+                video = video_record(videos[video_id])
+                video.number = number  # As found by discovery, with its regex
+                records.append((number, video))
+        return records
+
+    chunk = []
+    for numbered_id in numbered_ids:
+        chunk.append(numbered_id)
+        if len(chunk) == chunk_size:
+            yield from fetch(chunk)
+            chunk = []
+    if chunk:
+        yield from fetch(chunk)
+
+def prefetch(make_iterator, client_factory, size=BATCH_LIMIT):
+    """Run make_iterator(youtube) on a background thread with its own client, yielding its items at most size ahead."""
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(kind, value):
+        while not stop.is_set():
+            try:
+                items.put((kind, value), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for item in make_iterator(client_factory()):
+                if not put("item", item):
+                    return
+            put("end", None)
+        except Exception as e:
+            put("error", e)
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "end":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+# ---------------- Planning ----------------
+
+PLAN_CSV_FIELDS = ["video_id", "source_title", "title", "publish_time", "description", "tags", "category_id", "playlist_id", "skip_reason"]
+
+def build_plan(youtube, videos, config):
+    """Build the full plan of a run: titles, slots, metadata, playlist inserts, skips and projected quota.
+    Returns None if VIDEO_CATEGORY does not exist."""
+    category_id = resolve_category_id(youtube, config)
+    if category_id is None:
+        return None
+    entries = []
+    videos_to_update, problems = render_metadata(plan_updates(videos, config), config)
+    for video, title, publish_time in videos_to_update:
+        metadata = video.metadata or {}
+        entry = planned_video_entry(video, title, publish_time)
+        entry["description"] = metadata.get("description", config.get("DESCRIPTION"))
+        entry["tags"] = metadata.get("tags", config.get("VIDEO_TAGS"))
+        entry["category_id"] = category_id
+        entry["playlist_id"] = config["PLAYLIST_ID"]
+        entry["skip_reason"] = "; ".join(problems[video.id]) if video.id in problems else None
+        entries.append(entry)
+
+    planned = [entry for entry in videos_to_update if entry[0].id not in problems]
+    members = member_steps(youtube, config["PLAYLIST_ID"], planned)
+    unchanged_steps, counts = diff_updates(planned, config, category_id, members)
+    return {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "playlist_id": config["PLAYLIST_ID"],
+        "video_category": config.get("VIDEO_CATEGORY", "Entertainment"),
+        "category_id": category_id,
+        "projected_quota": sum(remaining_cost(video.id, members | unchanged_steps) for video, _, _ in planned),
+        "skipped": len(entries) - len(planned),
+        "unchanged": counts["unchanged"],
+        "already_in_playlist": len(members),
+        "videos": entries
+    }
+
+def write_plan(plan, plan_file):
+    """Write plan as CSV if plan_file ends with .csv, as JSON otherwise."""
+    if plan_file.endswith('.csv'):
+        with open(plan_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=PLAN_CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows({**entry, "tags": ",".join(entry["tags"] or [])} for entry in plan["videos"])
+    else:
+        with open(plan_file, 'w') as f:
+            json.dump(plan, f, indent=2, ensure_ascii=False)
+    logging.info(f"Wrote plan of {len(plan['videos'])} videos ({plan['skipped']} skipped, {plan['unchanged']} unchanged, "
+                 f"{plan['already_in_playlist']} already in the playlist, {plan['projected_quota']} quota units) to {plan_file}.")
+
+def load_plan(plan_file):
+    """Read a JSON plan back as the list of (video, title, publish_time) updates to apply."""
+    with open(plan_file, 'r') as f:
+        plan = json.load(f)
+    videos_to_update = [planned_video_to_update(entry) for entry in plan["videos"] if entry["skip_reason"] is None]
+    return plan, videos_to_update
+
+def apply_plan(youtube, plan_file, config, client_factory=None):
+    """Send exactly the updates recorded in plan_file, without re-scanning the channel or reading the configured metadata."""
+    plan, videos_to_update = load_plan(plan_file)
+    config["PLAYLIST_ID"] = plan["playlist_id"]
+    # Plans written before the category ID was recorded only hold the configured name
+    config["VIDEO_CATEGORY"] = plan.get("category_id") or plan["video_category"]
+    logging.info(f"Applying plan {plan_file}: {len(videos_to_update)} videos, {plan['projected_quota']} quota units projected.")
+    refresh_video_states(youtube, videos_to_update)
+    start_journal(config.get("JOURNAL_FILE"), videos_to_update)
+    return execute_updates(youtube, videos_to_update, config, client_factory)
+
+# ---------------- Scenarios ----------------
+
+def plan_updates(videos, config, slots=None):
+    """Compute the (video, title, publish_time) list of a run without calling the API, on slots or the configured schedule."""
     videos_to_update = []  # List to store videos that need updating
+    if slots is None:
+        slots = schedule_config_slots(config, len(videos)) if videos else []
 
     # First, gather all videos that need updating
     for i, video in enumerate(videos):
-        current_title = video['snippet']['title']
+        current_title = video.title
         
         # Check if the current title is not numeric
         if not re.match(ONLY_NUMBERS_REGEX, current_title):
             # Reset the title to just the video number
             video_number = int(re.search(CONTAINS_NUMBERS_REGEX, current_title).group())
-            video['snippet']['title'] = str(video_number)
+            video.title = str(video_number)
             logging.info(f"Resetting title for video '{current_title}' to '{video_number}' due to previous incomplete update.")
         
         # Then process the title with PREFIX and SUFFIX
         title = process_video_title(video, config["TITLE_PREFIX"], config["TITLE_SUFFIX"])
-        publish_time = calculate_publish_time(start_date, i, config["FIRST_INTERVAL"], config["SECOND_INTERVAL"], config["VIDEOS_PER_DAY"])
+        publish_time = slots[i]
         videos_to_update.append((video, title, publish_time))
 
-    # Update videos while keeping track of the quota
+    return videos_to_update
+
+
+def update_videos(youtube, videos, config, client_factory=None):
+    videos_to_update, skipped = skip_invalid_videos(*render_metadata(plan_updates(videos, config), config))
+    start_journal(config.get("JOURNAL_FILE"), videos_to_update)
+    return {**execute_updates(youtube, videos_to_update, config, client_factory), **skipped}
+
+
+def execute_updates(youtube, videos_to_update, config, client_factory=None, done_steps=frozenset(), category_id=None):
+    """Send the planned (video, title, publish_time) updates, skipping done_steps, as far as today's quota goes.
+    The others stay in the journal for `--resume`."""
+    # Resolve the category once, so a bad VIDEO_CATEGORY fails before any write
+    category_id = category_id or resolve_run_category_id(youtube, config)
+    if category_id is None:
+        return {}
+
+    # Videos already in the playlist need no insert, neither quota for it
+    done_steps = frozenset(done_steps) | member_steps(youtube, config["PLAYLIST_ID"], videos_to_update)
+    # Nor do videos already in their target state need an update
+    unchanged_steps, counts = diff_updates(videos_to_update, config, category_id, done_steps)
+    logging.info(f"Planned updates: {counts['full']} full, {counts['partial']} partial (one part), {counts['unchanged']} unchanged and skipped "
+                 f"({counts['unchanged'] * QUOTA_COSTS['videos.update']} quota units saved).")
+    videos_to_update, queued = select_within_quota(videos_to_update, done_steps | unchanged_steps, config.get("QUOTA_RESERVE", 0))
+    if queued:
+        logging.warning(f"Today's quota fits {len(videos_to_update)} videos. {len(queued)} videos are queued for the next run (--resume).")
+
+    if config.get("ASYNC_BACKEND"):
+        return update_videos_individually(youtube, videos_to_update, config, category_id, done_steps, config.get("MAX_IN_FLIGHT", 1))
+    if config.get("USE_BATCH", True):
+        return update_videos_in_batches(youtube, videos_to_update, config, category_id, client_factory, done_steps)
+    if config.get("CONCURRENCY", 1) > 1:
+        logging.warning("CONCURRENCY only applies to batched updates. Running sequentially.")
+    return update_videos_individually(youtube, videos_to_update, config, category_id, done_steps)
+
+
+def remaining_cost(video_id, done_steps):
+    """Quota still needed for a video: one update and one playlist insert, minus the finished steps."""
+    cost = 0
+    if (video_id, "update") not in done_steps:
+        cost += QUOTA_COSTS["videos.update"]
+    if (video_id, "playlist_insert") not in done_steps:
+        cost += QUOTA_COSTS["playlistItems.insert"]
+    return cost
+
+
+def select_within_quota(videos_to_update, done_steps=frozenset(), reserve=0):
+    """Split the planned videos into those that fit in today's remaining quota and those left for later."""
+    budget = remaining_quota() - reserve
+    for i, entry in enumerate(videos_to_update):
+        budget -= remaining_cost(entry[0].id, done_steps)
+        if budget < 0:
+            return videos_to_update[:i], videos_to_update[i:]
+    return videos_to_update, []
+
+
+def update_videos_in_batches(youtube, videos_to_update, config, category_id, client_factory=None, done_steps=frozenset()):
+    selected = videos_to_update
+    concurrency = config.get("CONCURRENCY", 1)
+    if client_factory and concurrency > 1:
+        # Each worker sends whole batches of updates on its own client; reports come back in order.
+        # Workers would interleave their playlist inserts, so those are sent afterwards, in order.
+        chunks = [selected[i:i+BATCH_LIMIT] for i in range(0, len(selected), BATCH_LIMIT)]
+        logging.info(f"Sending {len(chunks)} batches on {concurrency} workers.")
+        report = {}
+        for chunk_report in run_concurrently(
+            client_factory,
+            lambda client, chunk: batch_update_videos(client, chunk, config, category_id, done_steps, playlist_inserts=False),
+            chunks,
+            concurrency
+        ):
+            report.update(chunk_report)
+        insert_in_schedule_order(youtube, selected, report, config)
+    else:
+        report = batch_update_videos(youtube, selected, config, category_id, done_steps)
+
+    log_update_report(selected, report, config)
+    return report
+
+
+def log_update_report(videos_to_update, report, config):
     for video, title, publish_time in videos_to_update:
-        if quota_counter + 1650 > MAX_QUOTA:  # Check if the upcoming operations will exceed the quota
-            logging.warning("Approaching quota limit. Pausing updates.")
-            break
+        result = report[video.id]
+        if result["update"] == "ok":
+            logging.info(f"Updated video: {video.title} with new title: {title} and scheduled publish time: {publish_time}")
+        if result["playlist_insert"] == "ok":
+            logging.info(f"Added video: {video.title} to playlist: {config['PLAYLIST_ID']}")
 
-        try:
-            update_video(youtube, video,  publish_time, config )
-            quota_counter += 1600  # 1600 units for video update
-            logging.info(f"Updated video: {video['snippet']['title']} with new title: {title} and scheduled publish time: {publish_time}")
+    updated = sum(1 for result in report.values() if result["update"] == "ok")
+    unchanged = sum(1 for result in report.values() if result["update"] == "unchanged")
+    inserted = sum(1 for result in report.values() if result["playlist_insert"] == "ok")
+    logging.info(f"Run finished: {updated}/{len(report)} videos updated, {unchanged} already up to date, {inserted} added to playlist.")
+    logging.info(f"Quota used today: {QUOTA_LEDGER['used']}/{QUOTA_LEDGER['daily_quota']}")
 
-            add_to_playlist(youtube, config["PLAYLIST_ID"], video['id'])
-            quota_counter += 50  # 50 units for adding to playlist
-            logging.info(f"Added video: {video['snippet']['title']} to playlist: {config['PLAYLIST_ID']}")
 
-        except HttpError as e:
-            logging.error(f"Error updating video {video['snippet']['title']}: {e}")
+def resume_updates(youtube, config, client_factory=None):
+    """Finish the run recorded in JOURNAL_FILE without re-scanning the channel. Returns its report, or None without a journal."""
+    journal = load_journal(config.get("JOURNAL_FILE"))
+    if journal is None:
+        return None
+    videos_to_update, done_steps = journal
+    pending = [entry for entry in videos_to_update if remaining_cost(entry[0].id, done_steps)]
+    logging.info(f"Resuming run: {len(videos_to_update) - len(pending)}/{len(videos_to_update)} videos already done.")
+    refresh_video_states(youtube, pending)
+    return execute_updates(youtube, pending, config, client_factory, done_steps=done_steps)
+
+
+def stream_updates(youtube, config, client_factory=None):
+    """Update the drafts 50 at a time after a status-only pass over the channel: bounds memory, not the time to the first update."""
+    category_id = resolve_run_category_id(youtube, config)
+    if category_id is None:
+        return {}
+
+    numbered_ids = iter_relevant_video_ids(
+        youtube, config['START_VIDEO_NUMBER'], config['END_VIDEO_NUMBER'], config["REQ_MAX_RESULT"],
+        discovery_mode=config["DISCOVERY_MODE"]
+    )
+    drafts = []
+    scheduled_videos = []
+    for number, video in iter_video_details(youtube, numbered_ids, fields=STATUS_FIELDS):
+        if video.is_scheduled:
+            scheduled_videos.append(video)
+        elif video.is_draft:
+            drafts.append((number, video.id))
+    drafts = sorted(drafts)[:config["MAX_VIDEOS"]]
+    config["START_DATE"] = get_latest_date_plus_one_day(scheduled_videos) or config["START_DATE"]
+    config["TAKEN_SLOTS"] = [video.publish_at for video in scheduled_videos]
+    logging.info(f"Found {len(drafts)} drafts and {len(scheduled_videos)} scheduled videos. Scheduling from {config['START_DATE']}.")
+    del scheduled_videos
+
+    timezone = config_timezone(config)
+    slots = config_slots(config, {normalize_slot(parse_publish_at(value), timezone) for value in config["TAKEN_SLOTS"]})
+    journal_file = config.get("JOURNAL_FILE")
+    start_journal(journal_file, [])
+    chunk_size = BATCH_LIMIT * max(1, config.get("CONCURRENCY", 1))
+    report = {}
+
+    def send(chunk):
+        """Plan, journal and update a chunk of drafts. Returns False once the quota is used up."""
+        videos_to_update, skipped = skip_invalid_videos(*render_metadata(plan_updates(chunk, config, take_slots(slots, len(chunk))), config))
+        report.update(skipped)
+        extend_journal(journal_file, videos_to_update)
+        # Cost the chunk like execute_updates: playlist members and unchanged videos need less quota
+        done_steps = member_steps(youtube, config["PLAYLIST_ID"], videos_to_update)
+        unchanged_steps, _ = diff_updates(videos_to_update, config, category_id, done_steps)
+        selected, queued = select_within_quota(videos_to_update, done_steps | unchanged_steps, config.get("QUOTA_RESERVE", 0))
+        if selected:
+            report.update(execute_updates(youtube, selected, config, client_factory, category_id=category_id))
+        if queued:
+            logging.warning(f"Quota used up. {len(queued)} planned videos are queued for the next run (--resume); the others will be found by the next run.")
+            return False
+        return True
+
+    def make_stream(client):
+        return iter_video_details(client, drafts)
+
+    stream = prefetch(make_stream, client_factory) if client_factory else make_stream(youtube)
+    chunk = []
+    try:
+        for number, video in stream:
+            # Drafts scheduled by hand since the first pass keep their slot
+            if not video.is_draft:
+                continue
+            chunk.append(video)
+            if len(chunk) == chunk_size:
+                if not send(chunk):
+                    chunk = []
+                    break
+                chunk = []
+        if chunk:
+            send(chunk)
+    finally:
+        stream.close()
 
-        logging.info(f"Quota used so far: {quota_counter}")
+    logging.info(f"Streaming run finished: {len(drafts)} drafts found, {sum(1 for result in report.values() if result['update'] == 'ok')} updated.")
+    return report
 
 
 
 
 def get_latest_date_plus_one_day(scheduled_videos):
     if scheduled_videos:
-        latest_date = max([datetime.datetime.strptime(video['status']['publishAt'], '%Y-%m-%dT%H:%M:%SZ') for video in scheduled_videos])
+        latest_date = max([parse_publish_at(video.publish_at) for video in scheduled_videos])
         latest_date_date_only = latest_date.date()
         latest_date_plus_one_day = latest_date_date_only + timedelta(days=1)
         return datetime.datetime(latest_date_plus_one_day.year, latest_date_plus_one_day.month, latest_date_plus_one_day.day, 0, 0, 0, 0)
     else:
         return None
 
-def scenario_1():
-    youtube = authenticate_with_oauth()
-    config = load_configurations()
+def scenario_1(resume=False, plan_file=None, apply_file=None, env_file=None, overrides=None,
+               token_file='token.json', client_secrets_file='credentials.json', interactive=True):
+    """Run scenario 1. Returns the update report, or None for --plan runs.
+    env_file, overrides, token_file and client_secrets_file select the channel, for fleet runs."""
+    creds = load_credentials(token_file, client_secrets_file, interactive)
+    config = load_configurations(env_file, overrides)
+    if config["ASYNC_BACKEND"]:
+        youtube = build_pooled_client(creds, config["MAX_IN_FLIGHT"])
+    else:
+        youtube = build('youtube', 'v3', credentials=creds)
+    load_quota_ledger(config["QUOTA_LEDGER_FILE"], config["DAILY_QUOTA"])
+    configure_request_executor(config["MAX_RETRIES"], config["RATE_LIMIT"])
+    reset_metrics()
+    try:
+        return run_scenario_1(youtube, creds, config, resume, plan_file, apply_file)
+    finally:
+        report_run_metrics(config["METRICS_FILE"])
+
+def run_scenario_1(youtube, creds, config, resume=False, plan_file=None, apply_file=None):
+    if resume:
+        report = resume_updates(youtube, config, make_client_factory(creds))
+        if report is not None:
+            logging.info("Finished resuming scenario 1.")
+            return report
+
+    if apply_file:
+        report = apply_plan(youtube, apply_file, config, make_client_factory(creds))
+        logging.info("Finished applying plan.")
+        return report
     
+    if config["STREAMING"] and not plan_file:
+        report = stream_updates(youtube, config, make_client_factory(creds))
+        logging.info("Finished streaming scenario 1.")
+        return report
+
     max_results = config["REQ_MAX_RESULT"]
-    draft_videos, scheduled_videos = get_all_draft_videos(youtube, config['START_VIDEO_NUMBER'], config['END_VIDEO_NUMBER'], max_results)
+    max_in_flight = config["MAX_IN_FLIGHT"] if config["ASYNC_BACKEND"] else 1
+    if config["INVENTORY_DB"]:
+        draft_videos, scheduled_videos = get_all_draft_videos_from_inventory(
+            youtube, config["INVENTORY_DB"], config['START_VIDEO_NUMBER'], config['END_VIDEO_NUMBER'], max_results,
+            discovery_mode=config["DISCOVERY_MODE"], max_in_flight=max_in_flight
+        )
+    else:
+        draft_videos, scheduled_videos = get_all_draft_videos(youtube, config['START_VIDEO_NUMBER'], config['END_VIDEO_NUMBER'], max_results, discovery_mode=config["DISCOVERY_MODE"], max_in_flight=max_in_flight)
    
     config["START_DATE"] = get_latest_date_plus_one_day(scheduled_videos) or config["START_DATE"]
+    config["TAKEN_SLOTS"] = [video.publish_at for video in scheduled_videos]
 
     if scheduled_videos:
         logging.info(f"Found the latest scheduled video date: {config['START_DATE']}. Using this date as the starting point for scheduling draft videos.")
     else:
         logging.info(f"No scheduled videos found. Using default start date from config: {config['START_DATE']}")
     
-    update_videos(youtube, draft_videos[:config["MAX_VIDEOS"]], config)
+    if plan_file:
+        plan = build_plan(youtube, draft_videos[:config["MAX_VIDEOS"]], config)
+        if plan is None:
+            logging.error("Aborting plan: no valid video category.")
+            return
+        write_plan(plan, plan_file)
+        logging.info("Finished planning scenario 1. No video was updated.")
+        return
+
+    report = update_videos(youtube, draft_videos[:config["MAX_VIDEOS"]], config, make_client_factory(creds))
     logging.info("Finished scenario 1.")
+    return report
 
 
 
 # ---------------- Main Execution ----------------
 
-def main(scenario_name):
+def main(scenario_name, **options):
 
     scenarios = {
         "scenario_1": scenario_1
     }
 
     if scenario_name in scenarios:
-        scenarios[scenario_name]()
+        return scenarios[scenario_name](**options)
     else:
         logging.error(f"Scenario '{scenario_name}' not found.")
 
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Mass update and schedule YouTube draft videos.")
+    parser.add_argument("scenario", nargs="?", default="scenario_1", help="Scenario to run (default: scenario_1)")
+    parser.add_argument("--resume", action="store_true", help="Finish the run recorded in the journal instead of starting a new one")
+    parser.add_argument("--plan", dest="plan_file", nargs="?", const="plan.json", help="Write the run plan (JSON, or CSV for a .csv file) without updating any video")
+    parser.add_argument("--apply", dest="apply_file", help="Apply a JSON plan written by --plan")
+    parser.add_argument("--debug", action="store_true", help="Log at DEBUG level (slower, very verbose)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    # Here, you can specify which scenario to run
-    main("scenario_1")
\ No newline at end of file
+    args = parse_arguments()
+    load_dotenv()
+    configure_logging(args.debug or DEBUG_MODE or os.getenv('DEBUG_MODE', '').lower() == 'true')
+    main(args.scenario, resume=args.resume, plan_file=args.plan_file, apply_file=args.apply_file)
\ No newline at end of file